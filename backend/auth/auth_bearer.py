@@ -1,8 +1,9 @@
 from fastapi import Request, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from auth.auth_handler import decode_token
-from database import get_users_collection
-from bson import ObjectId
+from auth.principal_cache import get_principal
+from auth.revocations import revocation_table
+from config import settings
 
 class JWTBearer(HTTPBearer):
     def __init__(self, auto_error: bool = True):
@@ -16,31 +17,39 @@ class JWTBearer(HTTPBearer):
                     status_code=status.HTTP_403_FORBIDDEN,
                     detail="Invalid authentication scheme."
                 )
-            payload = self.verify_jwt(credentials.credentials)
-            
-            if not payload:
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="Invalid token or expired token."
-                )
-                
-            # Check if the user exists in the database
-            users_collection = await get_users_collection()
-            user = await users_collection.find_one({"_id": ObjectId(payload["user_id"])})
-            
-            if not user:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="User not found"
-                )
-                
-            return payload
+            return await self.authenticate(credentials.credentials)
         else:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Invalid authorization code."
             )
 
+    async def authenticate(self, jwtoken: str):
+        """Validate a raw token and its user; also used where no Request exists (WebSockets)"""
+        payload = self.verify_jwt(jwtoken)
+        
+        if not payload:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Invalid token or expired token."
+            )
+        
+        # Refuses revoked tokens and applies role changes, without a round-trip
+        payload = revocation_table.check(payload)
+        if settings.AUTH_STATELESS and revocation_table.is_fresh():
+            return payload
+            
+        # Check if the user exists (served from the principal cache when warm)
+        user = await get_principal(payload["user_id"])
+        
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+            
+        return payload
+
     def verify_jwt(self, jwtoken: str):
         try:
             payload = decode_token(jwtoken)
@@ -1,17 +1,116 @@
 import jwt
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from typing import Dict, Optional
 from datetime import datetime, timedelta
-from passlib.context import CryptContext
 from config import settings
 from fastapi import HTTPException, status
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+_pwd_context = None
+
+def get_pwd_context():
+    """passlib and its bcrypt backend are imported on first use, off the startup path"""
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
+
+def load_password_backend():
+    # Imports passlib and picks the bcrypt backend without paying for a hash
+    get_pwd_context().handler("bcrypt").get_backend()
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
+
+class PasswordHasherStats:
+    """Counters and recent latencies (queue wait + hashing) of pooled password operations"""
+
+    def __init__(self, window: int = 1024):
+        self.completed = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.latencies = deque(maxlen=window)
+
+    def observe(self, seconds: float):
+        self.completed += 1
+        self.latencies.append(seconds)
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 2)
+
+        return {
+            "workers": settings.PASSWORD_HASH_WORKERS,
+            "executor": settings.PASSWORD_HASH_EXECUTOR,
+            "queue_limit": settings.PASSWORD_HASH_QUEUE_LIMIT,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "p50_ms": percentile(0.50),
+            "p99_ms": percentile(0.99)
+        }
+
+password_hasher_stats = PasswordHasherStats()
+_password_executor = None
+
+def get_password_executor():
+    global _password_executor
+    if _password_executor is None:
+        # bcrypt releases the GIL, so threads are enough unless the box is CPU-starved
+        if settings.PASSWORD_HASH_EXECUTOR == "process":
+            _password_executor = ProcessPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS)
+        else:
+            _password_executor = ThreadPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS,
+                thread_name_prefix="password-hash"
+            )
+    return _password_executor
+
+def shutdown_password_executor():
+    global _password_executor
+    if _password_executor is not None:
+        _password_executor.shutdown(wait=False, cancel_futures=True)
+        _password_executor = None
+
+async def run_password_job(func, *args):
+    """Run a bcrypt operation off the event loop, shedding load once the queue is full"""
+    if password_hasher_stats.in_flight >= settings.PASSWORD_HASH_QUEUE_LIMIT:
+        password_hasher_stats.rejected += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many authentication requests, try again shortly",
+            headers={"Retry-After": "1"},
+        )
+
+    password_hasher_stats.in_flight += 1
+    start = time.perf_counter()
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_password_executor(), func, *args)
+    finally:
+        password_hasher_stats.in_flight -= 1
+        password_hasher_stats.observe(time.perf_counter() - start)
+
+async def warm_up_password_hasher():
+    """Start the hashing pool and load bcrypt in it, so the first login does not pay for either"""
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(get_password_executor(), load_password_backend)
+
+async def verify_password_async(plain_password, hashed_password):
+    return await run_password_job(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    return await run_password_job(get_password_hash, password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -1,6 +1,9 @@
 from fastapi import Request, HTTPException, status
 from models.user import UserRole
-from database import projects_collection, tasks_collection
+from database import get_projects_collection, get_tasks_collection
+from migrations import project_owner_id, project_owner_filter, schema_at_least
+from project_reaper import ACTIVE_TASK_FILTER
+from repositories import ProjectRepo, TaskRepo
 from bson import ObjectId
 
 async def is_admin(request: Request):
@@ -20,6 +23,7 @@ async def can_edit_project(request: Request, project_id: str):
     
     # Leader can only edit projects they created
     if user["role"] == UserRole.LEADER:
+        projects_collection = get_projects_collection()
         project = await projects_collection.find_one({"_id": ObjectId(project_id)})
         if not project:
             raise HTTPException(
@@ -27,7 +31,7 @@ async def can_edit_project(request: Request, project_id: str):
                 detail="Projeto não encontrado"
             )
         
-        if str(project["author_id"]) != str(user["_id"]):
+        if str(project_owner_id(project)) != str(user["_id"]):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You can only edit projects you created"
@@ -50,6 +54,7 @@ async def can_edit_task(request: Request, task_id: str):
     
     # Leaders can only edit tasks in projects they created
     if user["role"] == UserRole.LEADER:
+        tasks_collection = get_tasks_collection()
         task = await tasks_collection.find_one({"_id": ObjectId(task_id)})
         if not task:
             raise HTTPException(
@@ -57,14 +62,7 @@ async def can_edit_task(request: Request, task_id: str):
                 detail="Task not found"
             )
         
-        project = await projects_collection.find_one({"_id": ObjectId(task["project_id"])})
-        if not project:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Project not found"
-            )
-        
-        if str(project["author_id"]) != str(user["_id"]):
+        if str(await task_project_owner_id(task)) != str(user["_id"]):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You can only edit tasks in projects you created"
@@ -76,4 +74,94 @@ async def can_edit_task(request: Request, task_id: str):
     raise HTTPException(
         status_code=status.HTTP_403_FORBIDDEN,
         detail="Permission denied"
-    )
\ No newline at end of file
+    )
+
+# Permission-aware task queries.
+#
+# Tasks carry the owner of their project in project_owner_id (schema version 3),
+# so "owner, assignee or admin" is a plain indexed filter and each task endpoint
+# needs a single round-trip. Databases that have not been migrated yet fall back
+# to resolving the caller's projects first. Tasks of soft-deleted projects
+# are excluded for everyone, admins included, until the reaper removes them.
+
+async def task_access_filter(payload, owner_only: bool = False):
+    """Filter restricting tasks to those the caller may read, or with owner_only, manage"""
+    if payload["role"] == "admin":
+        return dict(ACTIVE_TASK_FILTER)
+
+    user_id = payload["user_id"]
+    if schema_at_least(3):
+        owner_clause = {"project_owner_id": user_id}
+    else:
+        projects_collection = get_projects_collection()
+        project_ids = [
+            str(project["_id"])
+            async for project in projects_collection.find(project_owner_filter(user_id), {"_id": 1})
+        ]
+        owner_clause = {"project_id": {"$in": project_ids}}
+
+    if owner_only:
+        return {**owner_clause, **ACTIVE_TASK_FILTER}
+    return {"$or": [owner_clause, {"assigned_to": user_id}], **ACTIVE_TASK_FILTER}
+
+def restrict_filter(filter_query, access_filter):
+    """Combine a query with an access filter without clobbering shared keys"""
+    if not access_filter:
+        return filter_query
+    if not filter_query:
+        return access_filter
+    if filter_query.keys().isdisjoint(access_filter.keys()):
+        return {**filter_query, **access_filter}
+    return {"$and": [filter_query, access_filter]}
+
+async def task_project_owner_id(task):
+    """Owner of the project a task belongs to"""
+    if "project_owner_id" in task:
+        return task["project_owner_id"]
+
+    # Task written before schema version 3
+    projects_collection = get_projects_collection()
+    project = await projects_collection.find_one({"_id": ObjectId(task["project_id"])})
+    return project_owner_id(project) if project else None
+
+async def check_task_access(task, payload, owner_only: bool = False):
+    """Raise 403 unless the caller may read (or with owner_only, manage) the task"""
+    if payload["role"] == "admin":
+        return
+    if not owner_only and task.get("assigned_to") == payload["user_id"]:
+        return
+    if await task_project_owner_id(task) != payload["user_id"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access forbidden"
+        )
+
+async def raise_task_write_denied(tasks: TaskRepo, task_id: str):
+    """Explain why a filtered task write matched nothing: 404 if the task is gone, else 403"""
+    if not await tasks.exists({"_id": ObjectId(task_id), **ACTIVE_TASK_FILTER}):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Task not found"
+        )
+    raise HTTPException(
+        status_code=status.HTTP_403_FORBIDDEN,
+        detail="Access forbidden"
+    )
+
+async def get_owned_project(projects: ProjectRepo, project_id: str, payload):
+    """Fetch a project, raising 404/403 unless it exists and the caller owns it (or is an admin)"""
+    project = await projects.get_active(project_id)
+
+    if not project:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Project not found"
+        )
+
+    if payload["role"] != "admin" and payload["user_id"] != project_owner_id(project):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access forbidden"
+        )
+
+    return project
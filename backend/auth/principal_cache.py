@@ -0,0 +1,83 @@
+import time
+from collections import OrderedDict
+from typing import Optional
+from bson import ObjectId
+from config import settings
+from database import get_users_collection
+
+# Authentication only needs to know that the user exists; nothing else (no password hash) is cached
+PRINCIPAL_PROJECTION = {"_id": 1}
+
+class PrincipalCache:
+    """Bounded LRU cache of verified principals keyed by user_id, with a TTL per entry.
+
+    Entries are per process and only invalidated by the process handling a
+    write, so they must never be used to build responses.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id: str) -> Optional[dict]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, user = entry
+        if expires_at < time.monotonic():
+            del self._entries[user_id]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return user
+
+    def set(self, user_id: str, user: dict):
+        if self.max_size <= 0:
+            return
+        self._entries[user_id] = (time.monotonic() + self.ttl_seconds, user)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, user_id: str):
+        self._entries.pop(user_id, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+principal_cache = PrincipalCache(
+    max_size=settings.PRINCIPAL_CACHE_SIZE,
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS
+)
+
+async def get_principal(user_id: str) -> Optional[dict]:
+    """Return the principal (the user's _id) for user_id, or None; MongoDB is hit only on a cache miss"""
+    user = principal_cache.get(user_id)
+    if user is not None:
+        return user
+
+    users_collection = get_users_collection()
+    user = await users_collection.find_one({"_id": ObjectId(user_id)}, PRINCIPAL_PROJECTION)
+    if user:
+        principal_cache.set(user_id, user)
+    return user
@@ -0,0 +1,125 @@
+"""Token revocation table shared by every worker through MongoDB.
+
+Access tokens carry user_id, role and token_version. Whenever a user's
+role changes, the user is deleted, or their tokens are revoked, one small
+document is upserted into the token_revocations collection:
+
+    {"_id": user_id, "role": ..., "token_version": n, "deleted": bool, "updated_at": ...}
+
+Every process keeps the whole collection in memory. The process making
+the change applies it at once, and the others pick it up within
+TOKEN_REVOCATION_REFRESH_SECONDS, since run_revocation_refresher() polls
+for documents updated since its last pass. Records expire with a TTL
+index once every token issued before them has expired, so the table stays
+about as large as the number of users changed in the last
+REMEMBER_ME_EXPIRE_DAYS.
+
+JWTBearer checks each token against the table: tokens of deleted users or
+with an old token_version are refused, and a changed role replaces the
+role claim. With AUTH_STATELESS the claims are then trusted without
+loading the user, so authentication costs no round-trip. If the table has
+not been refreshed for a while, JWTBearer goes back to loading the user.
+"""
+import asyncio
+import logging
+import time
+from datetime import timedelta
+from fastapi import HTTPException, status
+from pymongo import ReturnDocument
+from config import settings
+from database import get_token_revocations_collection, utcnow
+
+# Writers' clocks may lag behind the last updated_at seen, so each refresh re-reads a margin
+REFRESH_OVERLAP = timedelta(seconds=60)
+
+class RevocationTable:
+    def __init__(self):
+        self.entries = {}
+        self.last_seen = None
+        self.refreshed_at = None
+        self.refreshes = 0
+        self.errors = 0
+
+    def apply(self, record):
+        record = dict(record)
+        self.entries[str(record.pop("_id"))] = record
+        if self.last_seen is None or record["updated_at"] > self.last_seen:
+            self.last_seen = record["updated_at"]
+
+    def check(self, payload):
+        """Return the payload to trust for a verified token, or raise if the token was revoked"""
+        record = self.entries.get(payload["user_id"])
+        if record is None:
+            return payload
+
+        if record.get("deleted"):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+        if payload.get("token_version", 0) < record.get("token_version", 0):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Token has been revoked."
+            )
+        if record.get("role") and record["role"] != payload["role"]:
+            return {**payload, "role": record["role"]}
+        return payload
+
+    def is_fresh(self) -> bool:
+        # A few missed refreshes are tolerated before the table stops being trusted on its own
+        if self.refreshed_at is None:
+            return False
+        return time.monotonic() - self.refreshed_at < 3 * settings.TOKEN_REVOCATION_REFRESH_SECONDS
+
+    def refresh_filter(self):
+        """Records a refresh has to read: all of them at first, then those updated since the last one seen"""
+        if self.last_seen is None:
+            return {}
+        return {"updated_at": {"$gte": self.last_seen - REFRESH_OVERLAP}}
+
+    async def refresh(self):
+        collection = get_token_revocations_collection()
+        async for record in collection.find(self.refresh_filter()):
+            self.apply(record)
+
+        # The TTL index removes old records from the collection; drop them here too
+        cutoff = utcnow() - timedelta(days=settings.REMEMBER_ME_EXPIRE_DAYS)
+        for user_id in [user_id for user_id, record in self.entries.items() if record["updated_at"] < cutoff]:
+            del self.entries[user_id]
+
+        self.refreshed_at = time.monotonic()
+        self.refreshes += 1
+
+    def stats(self):
+        return {
+            "stateless": settings.AUTH_STATELESS,
+            "entries": len(self.entries),
+            "refreshes": self.refreshes,
+            "errors": self.errors,
+            "fresh": self.is_fresh()
+        }
+
+revocation_table = RevocationTable()
+
+async def publish_revocation(user_id: str, **changes):
+    """Record a role change, deletion or token version for user_id and apply it to this process"""
+    collection = get_token_revocations_collection()
+    record = await collection.find_one_and_update(
+        {"_id": user_id},
+        {"$set": {**changes, "updated_at": utcnow()}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    revocation_table.apply(record)
+
+async def run_revocation_refresher():
+    while True:
+        await asyncio.sleep(settings.TOKEN_REVOCATION_REFRESH_SECONDS)
+        try:
+            await revocation_table.refresh()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            revocation_table.errors += 1
+            logging.error(f"Error refreshing the token revocation table: {e}")
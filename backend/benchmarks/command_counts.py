@@ -0,0 +1,135 @@
+"""Count the MongoDB commands each write endpoint sends.
+
+Boots main:app in-process against MONGO_URI, using a throwaway database,
+drives every write endpoint once and prints the number of driver commands
+per endpoint as JSON. Exits with status 1 when an endpoint sends more
+commands than its budget, so round-trips added to a handler show up as a
+failure instead of a silent slowdown.
+
+Usage (from backend/, needs a running mongod and httpx installed):
+    python -m benchmarks.command_counts
+"""
+import json
+import os
+import sys
+from collections import Counter
+from pymongo import monitoring
+
+os.environ["DATABASE_NAME"] = os.environ.get("BENCHMARK_DATABASE_NAME", "task_management_benchmark")
+
+from fastapi.testclient import TestClient
+import database
+import migrations
+from main import app
+
+# Maximum number of commands each endpoint may send with a warm principal cache
+COMMAND_BUDGETS = {
+    "POST /api/register": 2,
+    "POST /api/projects": 1,
+    "PUT /api/projects/{id}": 1,
+    # Project lookup, insert, project_stats $inc
+    "POST /api/tasks": 3,
+    # find_one_and_update, project_stats $inc (the status changes)
+    "PUT /api/tasks/{id}": 2,
+    # find_one_and_delete, sync tombstone, project_stats $inc
+    "DELETE /api/tasks/{id}": 3,
+    "PUT /api/users/{id}": 1,
+}
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.commands = Counter()
+
+    def started(self, event):
+        self.commands[event.command_name] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def reset(self):
+        self.commands = Counter()
+
+def measure(counter, results, endpoint, send):
+    counter.reset()
+    response = send()
+    response.raise_for_status()
+    results[endpoint] = {
+        "commands": sum(counter.commands.values()),
+        "by_command": dict(counter.commands)
+    }
+    return response.json() if response.content else None
+
+def run():
+    counter = CommandCounter()
+    # Must be registered before the client is created in connect_to_mongo
+    monitoring.register(counter)
+
+    results = {}
+    with TestClient(app) as client:
+        client.portal.call(database.database.client.drop_database, database.database.name)
+        client.portal.call(database.ensure_indexes)
+        client.portal.call(migrations.run_migrations)
+
+        user = measure(counter, results, "POST /api/register", lambda: client.post(
+            "/api/register",
+            json={"name": "Bench", "email": "bench@example.com", "password": "bench", "role": "leader"}
+        ))
+        token = client.post(
+            "/api/login",
+            data={"username": "bench@example.com", "password": "bench"}
+        ).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        # Warm the principal cache so only the handler's own commands are counted
+        client.get("/api/users/me", headers=headers).raise_for_status()
+
+        project = measure(counter, results, "POST /api/projects", lambda: client.post(
+            "/api/projects",
+            json={"name": "Bench", "description": "Bench project", "deadline": "2030-01-01T00:00:00"},
+            headers=headers
+        ))
+        measure(counter, results, "PUT /api/projects/{id}", lambda: client.put(
+            f"/api/projects/{project['id']}",
+            json={"status": "In Progress"},
+            headers=headers
+        ))
+        task = measure(counter, results, "POST /api/tasks", lambda: client.post(
+            "/api/tasks",
+            json={
+                "title": "Bench",
+                "description": "Bench task",
+                "due_date": "2030-01-01T00:00:00",
+                "project_id": project["id"]
+            },
+            headers=headers
+        ))
+        measure(counter, results, "PUT /api/tasks/{id}", lambda: client.put(
+            f"/api/tasks/{task['id']}",
+            json={"status": "Completed"},
+            headers=headers
+        ))
+        measure(counter, results, "DELETE /api/tasks/{id}", lambda: client.delete(
+            f"/api/tasks/{task['id']}",
+            headers=headers
+        ))
+        measure(counter, results, "PUT /api/users/{id}", lambda: client.put(
+            f"/api/users/{user['id']}",
+            json={"name": "Bench 2"},
+            headers=headers
+        ))
+
+        client.portal.call(database.database.client.drop_database, database.database.name)
+
+    regressions = {
+        endpoint: result["commands"]
+        for endpoint, result in results.items()
+        if result["commands"] > COMMAND_BUDGETS[endpoint]
+    }
+    print(json.dumps({"results": results, "budgets": COMMAND_BUDGETS, "regressions": regressions}, indent=2))
+    return regressions
+
+if __name__ == "__main__":
+    sys.exit(1 if run() else 0)
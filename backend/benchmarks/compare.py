@@ -0,0 +1,71 @@
+"""Compare two benchmarks.load reports.
+
+Prints the change of throughput, p50/p95/p99 and MongoDB commands per
+request for every scenario present in both reports, and exits with
+status 1 when a scenario's p95 latency or throughput got worse by more
+than --threshold percent, or it sends more commands per request.
+
+Usage (from backend/):
+    python -m benchmarks.compare before.json after.json --threshold 10
+"""
+import argparse
+import json
+import sys
+
+METRICS = ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "mongo_commands_per_request")
+
+def change(before, after):
+    if before in (None, 0) or after is None:
+        return None
+    return round((after - before) / before * 100, 1)
+
+def compare(before, after, threshold: float):
+    rows = []
+    regressions = []
+    for name, old in before["scenarios"].items():
+        new = after["scenarios"].get(name)
+        if new is None:
+            continue
+        changes = {metric: change(old.get(metric), new.get(metric)) for metric in METRICS}
+        rows.append((name, old, new, changes))
+
+        if changes["p95_ms"] is not None and changes["p95_ms"] > threshold:
+            regressions.append(f"{name}: p95 {old['p95_ms']} -> {new['p95_ms']} ms")
+        if changes["throughput_rps"] is not None and changes["throughput_rps"] < -threshold:
+            regressions.append(f"{name}: throughput {old['throughput_rps']} -> {new['throughput_rps']} req/s")
+        if (old.get("mongo_commands_per_request") is not None and new.get("mongo_commands_per_request") is not None
+                and new["mongo_commands_per_request"] > old["mongo_commands_per_request"]):
+            regressions.append(
+                f"{name}: commands/request {old['mongo_commands_per_request']} -> {new['mongo_commands_per_request']}"
+            )
+    return rows, regressions
+
+def format_change(value):
+    return "n/a" if value is None else f"{value:+.1f}%"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmarks.load reports")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed regression in percent")
+    args = parser.parse_args(argv)
+
+    with open(args.before) as before_file, open(args.after) as after_file:
+        before, after = json.load(before_file), json.load(after_file)
+
+    rows, regressions = compare(before, after, args.threshold)
+    print(f"{before['meta'].get('commit')} -> {after['meta'].get('commit')}")
+    print(f"{'scenario':<32}" + "".join(f"{metric:>28}" for metric in METRICS))
+    for name, old, new, changes in rows:
+        cells = "".join(
+            f"{f'{old.get(metric)} -> {new.get(metric)} ({format_change(changes[metric])})':>28}"
+            for metric in METRICS
+        )
+        print(f"{name:<32}{cells}")
+
+    for regression in regressions:
+        print(f"REGRESSION  {regression}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
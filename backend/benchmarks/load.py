@@ -0,0 +1,303 @@
+"""Latency and throughput benchmark of the main endpoints.
+
+Boots main:app in-process (httpx ASGITransport, lifespan included) against
+either a local mongod (MONGO_URI, throwaway database) or an in-memory
+mongomock-motor backend, seeds users, projects and tasks, then drives each
+scenario with concurrent clients and prints one JSON document:
+
+    {"meta": {...}, "scenarios": {"GET /api/tasks": {"requests": n,
+     "errors": n, "throughput_rps": x, "p50_ms": x, "p95_ms": x,
+     "p99_ms": x, "mongo_commands_per_request": x}, ...}}
+
+Scenarios run one after another, so MongoDB commands are attributed by
+counting them per scenario. mongomock-motor does not publish command
+events, hence mongo_commands_per_request is null with that backend, and
+its timings only reflect the application side.
+
+Usage (from backend/, needs httpx; mongomock-motor for --backend mongomock):
+    python -m benchmarks.load --backend mongod --output before.json
+    python -m benchmarks.compare before.json after.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from bson import ObjectId
+from pymongo import monitoring
+
+os.environ["DATABASE_NAME"] = os.environ.get("BENCHMARK_DATABASE_NAME", "task_management_benchmark")
+# Background jobs would compete with the measured requests
+os.environ.setdefault("PROJECT_REAPER_ENABLED", "false")
+# Every simulated client shares one address and a few users, so the limits would cap the measurement
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("LOAD_SHED_AUTH_MAX_LAG_MS", "0")
+os.environ.setdefault("LOAD_SHED_API_MAX_LAG_MS", "0")
+
+import httpx
+import database
+import migrations
+from auth.auth_handler import create_access_token, get_password_hash
+from benchmarks.command_counts import CommandCounter
+from main import app
+
+PASSWORD = "benchmark"
+STATUSES = ["Pending", "In Progress", "Completed"]
+PRIORITIES = ["Low", "Medium", "High"]
+
+def percentile(latencies, p):
+    if not latencies:
+        return 0.0
+    return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 2)
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def use_mongomock():
+    """Point the database module at an in-memory client; connect_to_mongo then keeps it"""
+    try:
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError:
+        sys.exit("--backend mongomock needs mongomock-motor: pip install mongomock-motor")
+    database.client = AsyncMongoMockClient()
+    database.database = database.client[os.environ["DATABASE_NAME"]]
+
+async def seed(users: int, projects_per_user: int, tasks_per_project: int):
+    """Insert the dataset straight through the driver and return what the scenarios need"""
+    db = database.get_database()
+    now = database.utcnow()
+    hashed_password = get_password_hash(PASSWORD)
+    random.seed(42)
+
+    user_docs, project_docs, task_docs = [], [], []
+    for index in range(users):
+        user_id = ObjectId()
+        user_docs.append({
+            "_id": user_id,
+            "name": f"User {index}",
+            "email": f"user{index}@benchmark.local",
+            "role": "leader",
+            "hashed_password": hashed_password,
+            "created_at": now,
+            "updated_at": now
+        })
+        for _ in range(projects_per_user):
+            project_id = ObjectId()
+            project_docs.append({
+                "_id": project_id,
+                "name": f"Project {project_id}",
+                "description": "Benchmark project",
+                "deadline": now + timedelta(days=90),
+                "status": "In Progress",
+                "author_id": str(user_id),
+                "created_at": now,
+                "updated_at": now
+            })
+            for task_index in range(tasks_per_project):
+                task_docs.append({
+                    "_id": ObjectId(),
+                    "title": f"Task {task_index}",
+                    "description": "Benchmark task",
+                    "due_date": now + timedelta(days=random.randint(-30, 60)),
+                    "status": random.choice(STATUSES),
+                    "priority": random.choice(PRIORITIES),
+                    "project_id": str(project_id),
+                    "project_owner_id": str(user_id),
+                    "assigned_to": None,
+                    "created_by": str(user_id),
+                    "created_at": now,
+                    "updated_at": now
+                })
+
+    for name, documents in (("users", user_docs), ("projects", project_docs), ("tasks", task_docs)):
+        for start in range(0, len(documents), 10000):
+            await db[name].insert_many(documents[start:start + 10000])
+    # Brings the schema version and the project rollups up to date
+    await migrations.run_migrations()
+
+    principals = []
+    for user in user_docs:
+        user_id = str(user["_id"])
+        principals.append({
+            "user_id": user_id,
+            "email": user["email"],
+            "headers": {"Authorization": "Bearer " + create_access_token({"user_id": user_id, "role": "leader"})},
+            "projects": [str(project["_id"]) for project in project_docs if project["author_id"] == user_id],
+        })
+    tasks_by_project = {}
+    for task in task_docs:
+        tasks_by_project.setdefault(task["project_id"], []).append(str(task["_id"]))
+    return principals, tasks_by_project
+
+def scenarios(principals, tasks_by_project):
+    """(name, request factory) pairs; each factory builds one request for a random principal"""
+    due_date = (datetime.utcnow() + timedelta(days=30)).isoformat()
+
+    def pick():
+        principal = random.choice(principals)
+        return principal, random.choice(principal["projects"])
+
+    def pick_task():
+        principal, project_id = pick()
+        return principal, project_id, random.choice(tasks_by_project[project_id])
+
+    def list_tasks():
+        principal, project_id = pick()
+        return "GET", "/api/tasks", {"params": {"project_id": project_id}, "headers": principal["headers"]}
+
+    def list_tasks_page():
+        principal, _ = pick()
+        return "GET", "/api/tasks", {"params": {"limit": 50, "status": "Pending"}, "headers": principal["headers"]}
+
+    def get_task():
+        principal, _, task_id = pick_task()
+        return "GET", f"/api/tasks/{task_id}", {"headers": principal["headers"]}
+
+    def list_projects():
+        principal, _ = pick()
+        return "GET", "/api/projects", {"headers": principal["headers"]}
+
+    def project_stats():
+        principal, project_id = pick()
+        return "GET", f"/api/projects/{project_id}/stats", {"headers": principal["headers"]}
+
+    def current_user():
+        principal, _ = pick()
+        return "GET", "/api/users/me", {"headers": principal["headers"]}
+
+    def create_task():
+        principal, project_id = pick()
+        return "POST", "/api/tasks", {"headers": principal["headers"], "json": {
+            "title": "Created by the benchmark",
+            "description": "Benchmark task",
+            "due_date": due_date,
+            "project_id": project_id
+        }}
+
+    def update_task():
+        principal, _, task_id = pick_task()
+        return "PUT", f"/api/tasks/{task_id}", {
+            "headers": principal["headers"],
+            "json": {"status": random.choice(STATUSES)}
+        }
+
+    def login():
+        principal, _ = pick()
+        return "POST", "/api/login", {"data": {"username": principal["email"], "password": PASSWORD}}
+
+    return [
+        ("GET /api/tasks?project_id", list_tasks),
+        ("GET /api/tasks?status&limit", list_tasks_page),
+        ("GET /api/tasks/{id}", get_task),
+        ("GET /api/projects", list_projects),
+        ("GET /api/projects/{id}/stats", project_stats),
+        ("GET /api/users/me", current_user),
+        ("POST /api/tasks", create_task),
+        ("PUT /api/tasks/{id}", update_task),
+        ("POST /api/login", login),
+    ]
+
+async def run_scenario(client, build_request, requests: int, concurrency: int, counter):
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            method, url, options = build_request()
+            started = time.perf_counter()
+            response = await client.request(method, url, **options)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    if counter:
+        counter.reset()
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": round(requests / elapsed, 1),
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "mongo_commands_per_request": round(sum(counter.commands.values()) / requests, 2) if counter else None
+    }
+
+async def run(args):
+    counter = None
+    if args.backend == "mongomock":
+        await use_mongomock()
+    else:
+        counter = CommandCounter()
+        # Must be registered before the client is created in connect_to_mongo
+        monitoring.register(counter)
+
+    async with app.router.lifespan_context(app):
+        db = database.get_database()
+        await db.client.drop_database(db.name)
+        await database.ensure_indexes()
+        principals, tasks_by_project = await seed(args.users, args.projects, args.tasks)
+
+        transport = httpx.ASGITransport(app=app)
+        results = {}
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            for name, build_request in scenarios(principals, tasks_by_project):
+                if args.scenario and not any(selected in name for selected in args.scenario):
+                    continue
+                # Warm-up requests are not measured
+                await run_scenario(client, build_request, min(args.requests, 20), 1, None)
+                results[name] = await run_scenario(client, build_request, args.requests, args.concurrency, counter)
+                print(f"{name}: {results[name]}", file=sys.stderr)
+
+        await db.client.drop_database(db.name)
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "backend": args.backend,
+            "users": args.users,
+            "projects_per_user": args.projects,
+            "tasks_per_project": args.tasks,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "python": sys.version.split()[0],
+            "timestamp": datetime.utcnow().isoformat()
+        },
+        "scenarios": results
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--backend", choices=["mongod", "mongomock"], default="mongod")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--projects", type=int, default=5, help="projects per user")
+    parser.add_argument("--tasks", type=int, default=50, help="tasks per project")
+    parser.add_argument("--requests", type=int, default=500, help="measured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--scenario", action="append", help="only run scenarios containing this text")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = json.dumps(asyncio.run(run(args)), indent=2)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(report + "\n")
+    else:
+        print(report)
@@ -0,0 +1,225 @@
+"""Cache of serialized responses for hot single-document reads.
+
+GET /api/projects/{id}, GET /api/tasks/{id} and GET /api/users/me store
+the encoded body and ETag of a successful response under
+
+    response:<kind>:<document id>:<version>:<visibility>
+
+visibility is "admin" or the caller's user id, so a hit never skips the
+permission check of a different caller. Every document also has a
+version stamp; handlers read it before loading the document, and writes
+replace it (invalidate) once they are committed. A response built from a
+document read before a write is therefore stored under the old stamp and
+can never be served after that write.
+
+The in-process LRU backend is the default. It is per worker, and a write
+only invalidates the process that handled it, so the cache is disabled
+when WEB_CONCURRENCY says several workers serve the app (serve.py sets
+it); RESPONSE_CACHE_BACKEND=redis shares entries and stamps between
+workers (needs the redis package). Backend errors are logged and treated
+as misses, the TTL bounding how long an entry can outlive a failed
+invalidation.
+"""
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+from fastapi import Response
+from config import settings
+
+class MemoryCacheBackend:
+    """Bounded LRU of byte/str values with an optional TTL per entry"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self.evictions = 0
+
+    async def get(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at is not None and expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value, ttl_seconds: Optional[float] = None):
+        if self.max_size <= 0:
+            return
+        expires_at = time.monotonic() + ttl_seconds if ttl_seconds else None
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def add(self, key: str, value, ttl_seconds: Optional[float] = None):
+        """Set key unless it already holds a live value; returns the value now stored"""
+        current = await self.get(key)
+        if current is not None:
+            return current
+        await self.set(key, value, ttl_seconds)
+        return value
+
+    async def set_many(self, values: dict, ttl_seconds: Optional[float] = None):
+        for key, value in values.items():
+            await self.set(key, value, ttl_seconds)
+
+    async def close(self):
+        self._entries.clear()
+
+    def stats(self):
+        return {"size": len(self._entries), "max_size": self.max_size, "evictions": self.evictions}
+
+class RedisCacheBackend:
+    """Shared backend; any server speaking the Redis protocol works, e.g. a local redis-server in development"""
+
+    def __init__(self, url: str):
+        try:
+            from redis import asyncio as redis
+        except ImportError:
+            raise RuntimeError("RESPONSE_CACHE_BACKEND=redis needs the redis package: pip install redis")
+        self.client = redis.from_url(url)
+
+    async def get(self, key: str):
+        return await self.client.get(key)
+
+    async def set(self, key: str, value, ttl_seconds: Optional[float] = None):
+        await self.client.set(key, value, px=int(ttl_seconds * 1000) if ttl_seconds else None)
+
+    async def add(self, key: str, value, ttl_seconds: Optional[float] = None):
+        px = int(ttl_seconds * 1000) if ttl_seconds else None
+        if await self.client.set(key, value, px=px, nx=True):
+            return value
+        # Another worker initialised the key first; fall back to our value if it expired in between
+        return await self.client.get(key) or value
+
+    async def set_many(self, values: dict, ttl_seconds: Optional[float] = None):
+        async with self.client.pipeline(transaction=False) as pipeline:
+            for key, value in values.items():
+                pipeline.set(key, value, px=int(ttl_seconds * 1000) if ttl_seconds else None)
+            await pipeline.execute()
+
+    async def close(self):
+        await self.client.aclose()
+
+    def stats(self):
+        return {}
+
+def new_stamp() -> str:
+    # Unique rather than incremented: a stamp lost to eviction or expiry is
+    # replaced by a new one, never by an older value that stale entries used
+    return uuid.uuid4().hex[:16]
+
+class ResponseCache:
+    def __init__(self, backend, ttl_seconds: float):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    async def key(self, kind: str, document_id: str, visibility: str) -> Optional[str]:
+        """Entry key for the current version of a document; resolve it before reading the document"""
+        if not self.enabled:
+            return None
+        version_key = f"version:{kind}:{document_id}"
+        try:
+            # Stamps outlive entries, so an invalidation is not forgotten before the entries it hides
+            version = await self.backend.add(version_key, new_stamp(), self.ttl_seconds * 10)
+        except Exception as e:
+            self.errors += 1
+            logging.warning(f"Response cache unavailable: {e}")
+            return None
+        if isinstance(version, bytes):
+            version = version.decode()
+        return f"response:{kind}:{document_id}:{version}:{visibility}"
+
+    async def get(self, key: Optional[str]):
+        """(etag, body) stored under key, or None"""
+        if key is None:
+            return None
+        try:
+            entry = await self.backend.get(key)
+        except Exception as e:
+            self.errors += 1
+            logging.warning(f"Response cache unavailable: {e}")
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        etag, body = entry.split(b"\n", 1)
+        return etag.decode(), body
+
+    async def set(self, key: Optional[str], etag: str, body: bytes):
+        if key is None:
+            return
+        try:
+            await self.backend.set(key, etag.encode() + b"\n" + body, self.ttl_seconds)
+        except Exception as e:
+            self.errors += 1
+            logging.warning(f"Response cache unavailable: {e}")
+
+    async def invalidate(self, kind: str, *document_ids):
+        """Give the documents a new version stamp; call after the write has been committed"""
+        if not self.enabled or not document_ids:
+            return
+        try:
+            await self.backend.set_many(
+                {f"version:{kind}:{document_id}": new_stamp() for document_id in document_ids},
+                self.ttl_seconds * 10
+            )
+        except Exception as e:
+            self.errors += 1
+            logging.error(f"Could not invalidate cached {kind} responses: {e}")
+
+    async def close(self):
+        await self.backend.close()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": settings.RESPONSE_CACHE_BACKEND,
+            "enabled": self.enabled,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            **self.backend.stats()
+        }
+
+def visibility(payload) -> str:
+    """Who a cached response was checked for: admins share entries, everyone else has their own"""
+    return "admin" if payload["role"] == "admin" else payload["user_id"]
+
+def cached_response(etag: str, body: bytes) -> Response:
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+def create_response_cache():
+    if settings.RESPONSE_CACHE_BACKEND == "redis":
+        return ResponseCache(RedisCacheBackend(settings.RESPONSE_CACHE_URL), settings.RESPONSE_CACHE_TTL_SECONDS)
+
+    ttl_seconds = settings.RESPONSE_CACHE_TTL_SECONDS
+    if ttl_seconds > 0 and settings.WORKER_PROCESSES > 1:
+        # Other workers would keep serving what a write just replaced
+        logging.warning(
+            f"The in-process response cache is disabled with {settings.WORKER_PROCESSES} workers; "
+            "set RESPONSE_CACHE_BACKEND=redis to cache responses"
+        )
+        ttl_seconds = 0
+    return ResponseCache(MemoryCacheBackend(settings.RESPONSE_CACHE_SIZE), ttl_seconds)
+
+response_cache = create_response_cache()
@@ -0,0 +1,196 @@
+"""Fan-out of MongoDB change streams to WebSocket subscribers.
+
+One change stream per collection is shared by every subscriber of the
+process. Each event is matched against a subscriber's visibility (admin,
+project owner or task assignee) and queued for it. Queues are bounded and
+keyed by document, so a slow consumer gets the latest version of each
+document instead of every intermediate one; if it still falls too far
+behind, the oldest events are dropped and the client is told to resync.
+
+A delete carries no document to tell who could see it, so only admins get
+it from the projects and tasks streams. Everyone else learns of deletions
+(and of tasks reassigned away from them) from the sync tombstones, which
+name their audience.
+
+Change streams need a replica set or sharded cluster. On a standalone
+server the watchers log the error and retry, and subscribers stay idle.
+"""
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from pymongo.errors import PyMongoError
+from config import settings
+from database import get_collection
+from migrations import project_owner_id
+from serializers import task_to_dict, project_to_dict
+
+WATCHED_COLLECTIONS = ("projects", "tasks", "tombstones")
+WATCHED_OPERATIONS = ["insert", "update", "replace", "delete"]
+# Audience member standing for every admin; user ids are ObjectIds, so it cannot clash
+ADMINS = "admins"
+
+def change_to_event(collection_name, change):
+    """Translate a change stream document into a subscriber event and its audience, or (None, None)"""
+    document = change.get("fullDocument")
+
+    if collection_name == "tombstones":
+        # New tombstones only (expiring ones are deleted too), for the documents the feed covers
+        if change["operationType"] != "insert" or document is None or document["collection"] not in WATCHED_COLLECTIONS:
+            return None, None
+        event = {
+            "type": "change",
+            "collection": document["collection"],
+            "operation": "delete",
+            "id": document["document_id"],
+            "token": change["_id"]["_data"],
+            "document": None
+        }
+        # Admins can still see reassigned tasks and get real deletes from the collection itself
+        return event, set(document["audience"])
+
+    event = {
+        "type": "change",
+        "collection": collection_name,
+        "operation": change["operationType"],
+        "id": str(change["documentKey"]["_id"]),
+        "token": change["_id"]["_data"],
+        "document": None
+    }
+
+    if document is None:
+        # Deletes carry no document; users in its audience are told by the tombstone
+        return event, {ADMINS}
+
+    if collection_name == "projects":
+        audience = {project_owner_id(document), ADMINS}
+        event["document"] = {**project_to_dict(document), "deleted": document.get("deleted_at") is not None}
+    elif document.get("project_deleted_at") is not None:
+        # Hidden along with its deleted project; to clients it is gone already
+        audience = {document.get("project_owner_id"), document.get("assigned_to"), ADMINS}
+        event["operation"] = "delete"
+    else:
+        audience = {document.get("project_owner_id"), document.get("assigned_to"), ADMINS}
+        event["document"] = task_to_dict(document)
+
+    return event, audience
+
+class Subscriber:
+    """Bounded, per-document coalescing queue for one WebSocket connection"""
+
+    def __init__(self, payload, max_pending: int):
+        self.update(payload)
+        self.max_pending = max_pending
+        self.pending = OrderedDict()
+        self.ready = asyncio.Event()
+        self.overflowed = False
+        self.dropped = 0
+
+    def update(self, payload):
+        """Apply the claims of a re-checked token, e.g. a role change"""
+        self.user_id = payload["user_id"]
+        self.is_admin = payload["role"] == "admin"
+
+    def can_see(self, audience):
+        """audience None is for notices every subscriber gets, such as resyncs"""
+        return audience is None or (ADMINS if self.is_admin else self.user_id) in audience
+
+    def offer(self, event, audience=None):
+        key = (event["collection"], event["id"])
+        # Coalesce: only the latest change of a document is kept
+        self.pending.pop(key, None)
+        self.pending[key] = (event, audience)
+        while len(self.pending) > self.max_pending:
+            self.pending.popitem(last=False)
+            self.overflowed = True
+            self.dropped += 1
+        self.ready.set()
+
+    async def wait(self):
+        await self.ready.wait()
+
+    def take_events(self):
+        """Drain the queue; call update() first so events are filtered with the current claims"""
+        self.ready.clear()
+        # Visibility may have changed since the events were queued
+        events = [event for event, audience in self.pending.values() if self.can_see(audience)]
+        self.pending.clear()
+        if self.overflowed:
+            self.overflowed = False
+            events.insert(0, {"type": "resync", "reason": "overflow"})
+        return events
+
+class ChangeFeedHub:
+    def __init__(self):
+        self.subscribers = set()
+        self.watchers = {}
+        self.resume_tokens = {}
+        # Recent (event, audience) pairs so reconnecting clients can resume
+        self.recent = deque(maxlen=settings.CHANGE_FEED_REPLAY_SIZE)
+        self.events_received = 0
+
+    def subscribe(self, payload, resume_after=None):
+        subscriber = Subscriber(payload, settings.CHANGE_FEED_MAX_PENDING)
+        self.subscribers.add(subscriber)
+        self.start()
+
+        if resume_after:
+            tokens = [event["token"] for event, _ in self.recent]
+            if resume_after in tokens:
+                for event, audience in list(self.recent)[tokens.index(resume_after) + 1:]:
+                    if subscriber.can_see(audience):
+                        subscriber.offer(event, audience)
+            else:
+                subscriber.offer({"type": "resync", "reason": "resume token expired", "collection": None, "id": None})
+
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+
+    def start(self):
+        for collection_name in WATCHED_COLLECTIONS:
+            watcher = self.watchers.get(collection_name)
+            if watcher is None or watcher.done():
+                self.watchers[collection_name] = asyncio.create_task(self.watch(collection_name))
+
+    async def stop(self):
+        for watcher in self.watchers.values():
+            watcher.cancel()
+        self.watchers = {}
+
+    async def watch(self, collection_name):
+        collection = get_collection(collection_name)
+        while True:
+            try:
+                async with collection.watch(
+                    [{"$match": {"operationType": {"$in": WATCHED_OPERATIONS}}}],
+                    full_document="updateLookup",
+                    resume_after=self.resume_tokens.get(collection_name)
+                ) as stream:
+                    logging.info(f"Watching {collection_name} for changes")
+                    async for change in stream:
+                        self.resume_tokens[collection_name] = change["_id"]
+                        event, audience = change_to_event(collection_name, change)
+                        if event is not None:
+                            self.dispatch(event, audience)
+            except asyncio.CancelledError:
+                raise
+            except PyMongoError as e:
+                logging.error(f"Change stream on {collection_name} failed: {e}")
+                await asyncio.sleep(settings.CHANGE_FEED_RETRY_SECONDS)
+
+    def dispatch(self, event, audience):
+        self.events_received += 1
+        self.recent.append((event, audience))
+        for subscriber in self.subscribers:
+            if subscriber.can_see(audience):
+                subscriber.offer(event, audience)
+
+    def stats(self):
+        return {
+            "subscribers": len(self.subscribers),
+            "events_received": self.events_received,
+            "dropped": sum(subscriber.dropped for subscriber in self.subscribers)
+        }
+
+change_feed_hub = ChangeFeedHub()
@@ -0,0 +1,203 @@
+"""Negotiated response compression (zstd, brotli, gzip).
+
+CompressionMiddleware picks the encoding the client accepts with the
+highest q-value, preferring zstd, then br, then gzip on ties; zstd and br
+are only offered when the zstandard and brotli packages are installed.
+Bodies smaller than COMPRESSION_MIN_SIZE, responses that are already
+encoded and types that do not compress well are passed through untouched.
+
+Streamed responses (NDJSON task streams) are buffered only until they
+reach the minimum size, then every chunk is compressed and flushed on its
+own, so the client keeps receiving tasks as the cursor yields them.
+
+Levels default to the COMPRESSION_*_LEVEL settings and can be overridden
+per route template in main.py.
+"""
+import zlib
+from starlette.datastructures import Headers, MutableHeaders
+from config import settings
+from metrics import route_label
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    "text/",
+)
+
+class GzipEncoder:
+    def __init__(self, level: int):
+        # wbits 16 + MAX_WBITS writes the gzip header and trailer
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self.compressor.compress(data) + self.compressor.flush()
+
+class BrotliEncoder:
+    def __init__(self, level: int):
+        self.compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.process(data) + self.compressor.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self.compressor.process(data) + self.compressor.finish()
+
+class ZstdEncoder:
+    def __init__(self, level: int):
+        self.compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.compress(data) + self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self.compressor.compress(data) + self.compressor.flush()
+
+# In order of preference when the client accepts several with the same q-value
+ENCODERS = {}
+if zstandard is not None:
+    ENCODERS["zstd"] = ZstdEncoder
+if brotli is not None:
+    ENCODERS["br"] = BrotliEncoder
+ENCODERS["gzip"] = GzipEncoder
+
+def negotiate(accept_encoding: str):
+    """The supported encoding the client prefers, or None"""
+    accepted = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                continue
+        accepted[coding.strip().lower()] = quality
+
+    best, best_quality = None, 0.0
+    for coding in ENCODERS:
+        quality = accepted.get(coding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+def compressible(headers: Headers) -> bool:
+    if "content-encoding" in headers:
+        return False
+    content_type = headers.get("content-type", "")
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+class CompressionMiddleware:
+    """Pure ASGI, so streamed bodies are compressed as they are produced.
+
+    route_levels maps a route template to per-encoding levels, e.g.
+    {"/api/tasks": {"gzip": 4, "br": 3, "zstd": 3}}.
+    """
+
+    def __init__(self, app, routes, minimum_size: int = 1024, levels=None, route_levels=None):
+        self.app = app
+        self.routes = routes
+        self.minimum_size = minimum_size
+        self.levels = levels or {}
+        self.route_levels = route_levels or {}
+
+    def level_for(self, scope, encoding: str):
+        if self.route_levels:
+            overrides = self.route_levels.get(route_label(self.routes, scope))
+            if overrides and encoding in overrides:
+                return overrides[encoding]
+        return self.levels[encoding]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+
+        start_message = None
+        buffer = b""
+        encoder = None
+        passthrough = False
+
+        def begin(message_headers, compressed_length=None):
+            headers = MutableHeaders(raw=message_headers)
+            headers["Content-Encoding"] = encoding
+            headers.add_vary_header("Accept-Encoding")
+            if compressed_length is None:
+                # Streamed: the length is unknown until the last chunk
+                del headers["Content-Length"]
+            else:
+                headers["Content-Length"] = str(compressed_length)
+
+        async def send_compressed(message):
+            nonlocal start_message, buffer, encoder, passthrough
+
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                headers = Headers(raw=message["headers"])
+                if message["status"] < 200 or message["status"] in (204, 304) or not compressible(headers):
+                    passthrough = True
+                    await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if encoder is None:
+                buffer += body
+                if not more_body:
+                    # The whole body is known: compress it in one go, or skip it when small
+                    if len(buffer) < self.minimum_size:
+                        passthrough = True
+                        await send(start_message)
+                        await send({"type": "http.response.body", "body": buffer})
+                        return
+                    compressed = ENCODERS[encoding](self.level_for(scope, encoding)).finish(buffer)
+                    begin(start_message["headers"], len(compressed))
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+                if len(buffer) < self.minimum_size:
+                    return
+                encoder = ENCODERS[encoding](self.level_for(scope, encoding))
+                begin(start_message["headers"])
+                await send(start_message)
+                body, buffer = buffer, b""
+
+            if more_body:
+                chunk = encoder.compress(body)
+                if chunk:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            else:
+                await send({"type": "http.response.body", "body": encoder.finish(body)})
+
+        await self.app(scope, receive, send_compressed)
+
+def default_levels():
+    return {
+        "gzip": settings.COMPRESSION_GZIP_LEVEL,
+        "br": settings.COMPRESSION_BROTLI_LEVEL,
+        "zstd": settings.COMPRESSION_ZSTD_LEVEL,
+    }
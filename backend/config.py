@@ -9,5 +9,116 @@ class Settings:
     SECRET_KEY = os.getenv("SECRET_KEY", "dev_secret_key")
     ALGORITHM = os.getenv("ALGORITHM", "HS256") 
     ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+    REMEMBER_ME_EXPIRE_DAYS = int(os.getenv("REMEMBER_ME_EXPIRE_DAYS", "30"))
+    # Trust the token claims without loading the user; revocations come from auth/revocations.py
+    AUTH_STATELESS = os.getenv("AUTH_STATELESS", "false").lower() == "true"
+    TOKEN_REVOCATION_REFRESH_SECONDS = float(os.getenv("TOKEN_REVOCATION_REFRESH_SECONDS", "5"))
+
+    # MongoDB connection pool, sized per worker process
+    MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+    # serve.py divides this between its workers unless MONGO_MAX_POOL_SIZE is set
+    MONGO_POOL_BUDGET = int(os.getenv("MONGO_POOL_BUDGET", "200"))
+    MONGO_MIN_WORKER_POOL_SIZE = int(os.getenv("MONGO_MIN_WORKER_POOL_SIZE", "10"))
+    MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+    # How long a request may wait for a free connection; empty waits for serverSelectionTimeoutMS
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS") or 0) or None
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "30000"))
+    MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "20000"))
+    MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS") or 0) or None
+    # Connections opened during startup, so the first requests do not wait for handshakes
+    MONGO_WARM_UP_CONNECTIONS = int(os.getenv("MONGO_WARM_UP_CONNECTIONS", "4"))
+    # Comma-separated wire compressors in order of preference, e.g. "zstd,snappy"
+    MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "")
+    # Read preference of list endpoints per collection, e.g. "tasks=secondaryPreferred,projects=nearest"
+    MONGO_LIST_READ_PREFERENCES = dict(
+        item.strip().split("=", 1) for item in os.getenv("MONGO_LIST_READ_PREFERENCES", "").split(",") if "=" in item
+    )
+    # How stale a secondary may be to serve list reads (minimum 90)
+    MONGO_MAX_STALENESS_SECONDS = int(os.getenv("MONGO_MAX_STALENESS_SECONDS", "-1"))
+    # Enables checks that are too costly for production, e.g. response validation
+    DEBUG = os.getenv("DEBUG", "false").lower() == "true"
+
+    # Verified-principal cache used by JWTBearer to check that a token's user still exists
+    PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+    PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+
+    # Cached responses of GET /projects/{id}, /tasks/{id} and /users/me ("memory" or "redis"); a TTL of 0 disables it.
+    # The memory backend is per process and is turned off when WORKER_PROCESSES > 1.
+    RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+    RESPONSE_CACHE_URL = os.getenv("RESPONSE_CACHE_URL", "redis://localhost:6379/0")
+    RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "20000"))
+    RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "30"))
+
+    # Response compression; bodies below the minimum size are sent as they are
+    COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+    COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+    COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+    COMPRESSION_BROTLI_LEVEL = int(os.getenv("COMPRESSION_BROTLI_LEVEL", "4"))
+    COMPRESSION_ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+
+    # Token-bucket rate limits per client ("memory" or "redis" backend), configured per router in main.py
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+    RATE_LIMIT_URL = os.getenv("RATE_LIMIT_URL", "redis://localhost:6379/0")
+    RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+    # /api/login and /api/register, per client address
+    RATE_LIMIT_AUTH_PER_MINUTE = float(os.getenv("RATE_LIMIT_AUTH_PER_MINUTE", "30"))
+    RATE_LIMIT_AUTH_BURST = int(os.getenv("RATE_LIMIT_AUTH_BURST", "10"))
+    # Other API routes, per user (per address for anonymous calls)
+    RATE_LIMIT_API_PER_SECOND = float(os.getenv("RATE_LIMIT_API_PER_SECOND", "20"))
+    RATE_LIMIT_API_BURST = int(os.getenv("RATE_LIMIT_API_BURST", "100"))
+
+    # 503 once the event loop lags by more than this; 0 disables shedding for the routers
+    LOAD_SHED_SAMPLE_INTERVAL_MS = float(os.getenv("LOAD_SHED_SAMPLE_INTERVAL_MS", "50"))
+    LOAD_SHED_AUTH_MAX_LAG_MS = float(os.getenv("LOAD_SHED_AUTH_MAX_LAG_MS", "100"))
+    LOAD_SHED_API_MAX_LAG_MS = float(os.getenv("LOAD_SHED_API_MAX_LAG_MS", "300"))
+
+    # Worker pool for bcrypt hashing/verification ("thread" or "process")
+    PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+    # Password operations allowed to run or wait at once before returning 503
+    PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", "64"))
+
+    # Maximum number of operations accepted by POST /api/tasks:batch
+    TASK_BATCH_MAX_OPERATIONS = int(os.getenv("TASK_BATCH_MAX_OPERATIONS", "1000"))
+
+    # GET /api/sync: how long deletions are remembered, and how far each delta looks back for late commits
+    SYNC_TOMBSTONE_RETENTION_DAYS = int(os.getenv("SYNC_TOMBSTONE_RETENTION_DAYS", "30"))
+    SYNC_OVERLAP_SECONDS = int(os.getenv("SYNC_OVERLAP_SECONDS", "30"))
+    # Documents per response while a reset is paged through
+    SYNC_RESET_PAGE_SIZE = int(os.getenv("SYNC_RESET_PAGE_SIZE", "1000"))
+
+    # Background removal of the tasks of deleted projects
+    PROJECT_REAPER_ENABLED = os.getenv("PROJECT_REAPER_ENABLED", "true").lower() == "true"
+    PROJECT_REAPER_BATCH_SIZE = int(os.getenv("PROJECT_REAPER_BATCH_SIZE", "500"))
+    PROJECT_REAPER_BATCH_DELAY_SECONDS = float(os.getenv("PROJECT_REAPER_BATCH_DELAY_SECONDS", "0.2"))
+    PROJECT_REAPER_IDLE_SECONDS = float(os.getenv("PROJECT_REAPER_IDLE_SECONDS", "10"))
+    PROJECT_REAPER_LEASE_SECONDS = int(os.getenv("PROJECT_REAPER_LEASE_SECONDS", "60"))
+
+    # WebSocket change feed
+    CHANGE_FEED_MAX_PENDING = int(os.getenv("CHANGE_FEED_MAX_PENDING", "100"))
+    CHANGE_FEED_REPLAY_SIZE = int(os.getenv("CHANGE_FEED_REPLAY_SIZE", "1000"))
+    CHANGE_FEED_RETRY_SECONDS = float(os.getenv("CHANGE_FEED_RETRY_SECONDS", "5"))
+    # How often an open subscription re-checks that its user still exists (expiry and revocations: every batch)
+    CHANGE_FEED_REAUTH_SECONDS = float(os.getenv("CHANGE_FEED_REAUTH_SECONDS", "30"))
+
+    # HTTP server (serve.py; main.py only uses the port, reload and trusted proxies)
+    SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+    SERVER_PORT = int(os.getenv("PORT", "8000"))
+    SERVER_WORKERS = int(os.getenv("WEB_CONCURRENCY") or os.cpu_count() or 1)
+    # Processes serving the app on this host, as seen by each of them: serve.py exports WEB_CONCURRENCY
+    # to its workers, and uvicorn --workers / gunicorn -w deployments set it alongside
+    WORKER_PROCESSES = int(os.getenv("WEB_CONCURRENCY") or "1")
+    SERVER_RELOAD = os.getenv("SERVER_RELOAD", "false").lower() == "true"
+    SERVER_BACKLOG = int(os.getenv("SERVER_BACKLOG", "2048"))
+    # Longer than the load balancer's idle timeout, so it never reuses a connection being closed
+    SERVER_KEEP_ALIVE_SECONDS = int(os.getenv("SERVER_KEEP_ALIVE_SECONDS", "75"))
+    SERVER_GRACEFUL_SHUTDOWN_SECONDS = int(os.getenv("SERVER_GRACEFUL_SHUTDOWN_SECONDS", "30"))
+    SERVER_ACCESS_LOG = os.getenv("SERVER_ACCESS_LOG", "true").lower() == "true"
+    # Proxies whose X-Forwarded-For/-Proto are trusted; per-address rate limits need the real client address.
+    # On Render the app is only reachable through its proxy, whose address is not fixed.
+    SERVER_FORWARDED_ALLOW_IPS = os.getenv("SERVER_FORWARDED_ALLOW_IPS") or (
+        "*" if os.getenv("RENDER", "").lower() == "true" else "127.0.0.1"
+    )
 
 settings = Settings()
\ No newline at end of file
@@ -1,26 +1,250 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+from pymongo.monitoring import ConnectionPoolListener
+from pymongo.read_preferences import Primary, PrimaryPreferred, Secondary, SecondaryPreferred, Nearest
 from config import settings
+from metrics import command_metrics
+from collections import deque
+from datetime import datetime
 import logging
 import asyncio
+import threading
 
 # Global variables to store connections
 client = None
 database = None
 
-# Function to get collections
-async def get_collection(collection_name):
+# Index registry: every query issued by the routers must be served by one of these
+INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True, name="email_unique"),
+        # Admin delta sync
+        IndexModel([("updated_at", ASCENDING)], name="updated_at"),
+    ],
+    "projects": [
+        # updated_at is last for delta sync (GET /api/sync)
+        IndexModel(
+            [("author_id", ASCENDING), ("deleted_at", ASCENDING), ("updated_at", ASCENDING)],
+            name="author_id_deleted_at_updated_at"
+        ),
+        IndexModel(
+            [("user_id", ASCENDING), ("deleted_at", ASCENDING), ("updated_at", ASCENDING)],
+            name="legacy_user_id_deleted_at_updated_at"
+        ),
+        IndexModel([("deleted_at", ASCENDING), ("updated_at", ASCENDING)], name="deleted_at_updated_at"),
+        IndexModel(
+            [("deletion.status", ASCENDING), ("deletion.requested_at", ASCENDING)],
+            sparse=True,
+            name="pending_deletion"
+        ),
+    ],
+    "tasks": [
+        # Listings sort by (due_date, _id); status, priority and date filters are applied within these
+        IndexModel(
+            [("project_id", ASCENDING), ("due_date", ASCENDING), ("_id", ASCENDING)],
+            name="project_due_date"
+        ),
+        IndexModel(
+            [("assigned_to", ASCENDING), ("due_date", ASCENDING), ("_id", ASCENDING)],
+            name="assigned_to_due_date"
+        ),
+        IndexModel(
+            [("project_owner_id", ASCENDING), ("due_date", ASCENDING), ("_id", ASCENDING)],
+            name="project_owner_due_date"
+        ),
+        IndexModel([("title", TEXT), ("description", TEXT)], name="title_description_text"),
+        # Delta sync for non-admin users
+        IndexModel([("project_owner_id", ASCENDING), ("updated_at", ASCENDING)], name="owner_updated_at"),
+        IndexModel([("assigned_to", ASCENDING), ("updated_at", ASCENDING)], name="assigned_to_updated_at"),
+        # Admin delta sync
+        IndexModel([("updated_at", ASCENDING)], name="updated_at"),
+    ],
+    "tombstones": [
+        IndexModel([("audience", ASCENDING), ("deleted_at", ASCENDING)], name="audience_deleted_at"),
+        # Admin delta sync, and expiry once clients that old are reset anyway
+        IndexModel(
+            [("deleted_at", ASCENDING)],
+            expireAfterSeconds=settings.SYNC_TOMBSTONE_RETENTION_DAYS * 24 * 3600,
+            name="deleted_at_ttl"
+        ),
+    ],
+    "token_revocations": [
+        # Serves the incremental refresh and drops records older than any token they could affect
+        IndexModel(
+            [("updated_at", ASCENDING)],
+            expireAfterSeconds=settings.REMEMBER_ME_EXPIRE_DAYS * 24 * 3600,
+            name="updated_at_ttl"
+        ),
+    ],
+}
+
+READ_PREFERENCES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+class PoolStats(ConnectionPoolListener):
+    """Connection pool counters and checkout wait times, for sizing MONGO_MAX_POOL_SIZE.
+
+    The driver publishes these events from its own threads, hence the lock.
+    """
+
+    def __init__(self, window: int = 1024):
+        self.lock = threading.Lock()
+        self.checked_out = 0
+        self.in_use = 0
+        self.created = 0
+        self.closed = 0
+        self.failures = {}
+        self.waits = deque(maxlen=window)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self.lock:
+            self.created += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self.lock:
+            self.closed += 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        with self.lock:
+            self.failures[event.reason] = self.failures.get(event.reason, 0) + 1
+
+    def connection_checked_out(self, event):
+        with self.lock:
+            self.checked_out += 1
+            self.in_use += 1
+            # duration is only reported by PyMongo 4.7+
+            if getattr(event, "duration", None) is not None:
+                self.waits.append(event.duration)
+
+    def connection_checked_in(self, event):
+        with self.lock:
+            self.in_use -= 1
+
+    def stats(self):
+        with self.lock:
+            waits = sorted(self.waits)
+            failures = dict(self.failures)
+
+        def percentile(p):
+            if not waits:
+                return 0.0
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))] * 1000, 2)
+
+        return {
+            "max_pool_size": settings.MONGO_MAX_POOL_SIZE,
+            "min_pool_size": settings.MONGO_MIN_POOL_SIZE,
+            "open": self.created - self.closed,
+            "in_use": self.in_use,
+            "checked_out": self.checked_out,
+            "checkout_failures": failures,
+            "checkout_wait_p50_ms": percentile(0.50),
+            "checkout_wait_p99_ms": percentile(0.99),
+            "checkout_wait_max_ms": round(waits[-1] * 1000, 2) if waits else 0.0
+        }
+
+pool_stats = PoolStats()
+
+def client_options():
+    """AsyncIOMotorClient keyword arguments built from the MONGO_* settings"""
+    options = {
+        "tlsAllowInvalidCertificates": True,
+        "maxPoolSize": settings.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGO_MIN_POOL_SIZE,
+        "serverSelectionTimeoutMS": settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": settings.MONGO_CONNECT_TIMEOUT_MS,
+        "event_listeners": [pool_stats, command_metrics],
+    }
+    if settings.MONGO_WAIT_QUEUE_TIMEOUT_MS:
+        options["waitQueueTimeoutMS"] = settings.MONGO_WAIT_QUEUE_TIMEOUT_MS
+    if settings.MONGO_SOCKET_TIMEOUT_MS:
+        options["socketTimeoutMS"] = settings.MONGO_SOCKET_TIMEOUT_MS
+    if settings.MONGO_COMPRESSORS:
+        options["compressors"] = settings.MONGO_COMPRESSORS
+    return options
+
+def list_read_preference(collection_name):
+    mode = settings.MONGO_LIST_READ_PREFERENCES.get(collection_name, "primary")
+    if mode not in READ_PREFERENCES:
+        raise ValueError(f"Unknown read preference {mode!r} for {collection_name}")
+    if mode == "primary":
+        return Primary()
+    return READ_PREFERENCES[mode](max_staleness=settings.MONGO_MAX_STALENESS_SECONDS)
+
+def get_database():
+    """The connected database; the connection is opened by connect_to_mongo in the app lifespan"""
     if database is None:
-        await connect_to_mongo()
-    return database[collection_name]
+        raise RuntimeError("MongoDB is not connected: call connect_to_mongo() first")
+    return database
+
+def with_list_read_preference(collection):
+    """Collection handle for list endpoints, which may read from secondaries.
+
+    Anything that must see the caller's own writes (single-document reads
+    after an update, permission checks) keeps using the primary handle.
+    """
+    if collection.name not in settings.MONGO_LIST_READ_PREFERENCES:
+        return collection
+    return collection.with_options(read_preference=list_read_preference(collection.name))
+
+# Collection handles of the connected database, created once per connection
+_collections = {}
+
+def get_collection(collection_name):
+    """Handle of a collection; a plain lookup, so callers on the request path do not await anything"""
+    collection = _collections.get(collection_name)
+    if collection is None:
+        collection = _collections[collection_name] = get_database()[collection_name]
+    return collection
+
+def get_users_collection():
+    return get_collection("users")
 
-async def get_users_collection():
-    return await get_collection("users")
+def get_projects_collection():
+    return get_collection("projects")
 
-async def get_projects_collection():
-    return await get_collection("projects")
+def get_tasks_collection():
+    return get_collection("tasks")
 
-async def get_tasks_collection():
-    return await get_collection("tasks")
+def get_project_stats_collection():
+    return get_collection("project_stats")
+
+def get_meta_collection():
+    return get_collection("meta")
+
+def get_token_revocations_collection():
+    return get_collection("token_revocations")
+
+def get_tombstones_collection():
+    return get_collection("tombstones")
+
+def utcnow():
+    """Current UTC time truncated to the millisecond precision MongoDB stores"""
+    now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
 
 async def connect_to_mongo():
     global client, database
@@ -30,7 +254,7 @@ async def connect_to_mongo():
     
     logging.info("Initializing MongoDB connection...")
     try:
-        client = AsyncIOMotorClient(settings.MONGO_URI, tlsAllowInvalidCertificates=True)
+        client = AsyncIOMotorClient(settings.MONGO_URI, **client_options())
         database = client[settings.DATABASE_NAME]
 
         await database.command("ping")
@@ -40,19 +264,39 @@ async def connect_to_mongo():
         logging.error(f"Error connecting to MongoDB: {e}")
         raise
 
+async def ensure_indexes():
+    """Create every index in INDEXES; existing indexes are left untouched"""
+    async def ensure_collection_indexes(collection_name, indexes):
+        try:
+            await database[collection_name].create_indexes(indexes)
+        except OperationFailure as e:
+            # A conflicting or unbuildable index (e.g. duplicate emails) must not block startup
+            logging.error(f"Error creating indexes on {collection_name}: {e}")
+
+    # Still one createIndexes command per collection, but sent concurrently rather than one after another
+    await asyncio.gather(*(
+        ensure_collection_indexes(collection_name, indexes) for collection_name, indexes in INDEXES.items()
+    ))
+    logging.info("MongoDB indexes ensured")
+
+async def warm_up_pool(connections: int):
+    """Open (and authenticate, and TLS-handshake) connections before the first requests need them"""
+    await asyncio.gather(*(database.command("ping") for _ in range(connections)))
+
 async def close_mongo_connection():
     global client, database
     if client:
         client.close()
         client = None
         database = None
+        _collections.clear()
         logging.info("Connection to MongoDB closed")
 
 async def check_database_connection():
+    # Only reports on the connection; it is opened by the lifespan, never from a request
+    if database is None:
+        return {"status": "disconnected", "error": "MongoDB is not connected"}
     try:
-        if database is None:
-            await connect_to_mongo()
-            
         await database.command("ping")
         return {"status": "connected", "database": settings.DATABASE_NAME}
     except Exception as e:
@@ -0,0 +1,85 @@
+"""Weak ETags for conditional GETs and optimistic concurrency.
+
+A single document's ETag is its id and updated_at in milliseconds, so it
+is known as soon as the document is loaded. A list's ETag hashes the query
+with the id and updated_at of every document in the result, so it is
+built from the page being returned at no extra cost. Only a request that
+sends If-None-Match first fetches those two fields (VERSION_PROJECTION)
+to compare, and loads the documents themselves when the tag differs.
+
+Every write that changes a response must bump updated_at; deletes and
+inserts change the ids in the list.
+"""
+import hashlib
+from datetime import datetime, timedelta
+from fastapi import HTTPException, Request, Response, status
+from bson import json_util
+
+EPOCH = datetime(1970, 1, 1)
+
+def to_millis(value: datetime):
+    return (value - EPOCH) // timedelta(milliseconds=1)
+
+def document_etag(document):
+    updated_at = document.get("updated_at") or EPOCH
+    return f'W/"{document["_id"]}-{to_millis(updated_at)}"'
+
+# All a list ETag needs from each document
+VERSION_PROJECTION = {"_id": 1, "updated_at": 1}
+
+def list_etag(documents, *variant):
+    """ETag of a list of documents; variant covers the filter, sort, limit and similar options"""
+    digest = hashlib.sha1(json_util.dumps(variant).encode())
+    for document in documents:
+        digest.update(f"{document['_id']}-{to_millis(document.get('updated_at') or EPOCH)},".encode())
+    return f'W/"{digest.hexdigest()[:24]}"'
+
+def revalidating(request: Request) -> bool:
+    """Whether the client sent If-None-Match, i.e. whether a 304 is possible at all"""
+    return "if-none-match" in request.headers
+
+def parse_etags(header: str):
+    """Opaque tags of an If-None-Match/If-Match header, ignoring the weak prefix"""
+    return {tag.strip().removeprefix("W/") for tag in header.split(",") if tag.strip()}
+
+def not_modified(request: Request, etag: str):
+    """A 304 response if the client's If-None-Match already has etag, else None"""
+    header = request.headers.get("if-none-match")
+    if header is None:
+        return None
+    tags = parse_etags(header)
+    if "*" in tags or etag.removeprefix("W/") in tags:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return None
+
+def if_match_updated_at(request: Request, document_id: str):
+    """updated_at the client expects the document to have, from If-Match.
+
+    Returns None when there is no precondition (no header or `*`). A tag
+    for another document or in an unknown format can never match, so it
+    fails with 412 straight away.
+    """
+    header = request.headers.get("if-match")
+    if header is None:
+        return None
+    tags = parse_etags(header)
+    if "*" in tags:
+        return None
+
+    for tag in tags:
+        tag_id, _, millis = tag.strip('"').rpartition("-")
+        if tag_id == document_id and millis.isdigit():
+            return EPOCH + timedelta(milliseconds=int(millis))
+
+    raise HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail="The resource has been modified"
+    )
+
+async def raise_if_modified(collection, filter_query):
+    """After a conditional write matched nothing: 412 if the document is otherwise writable"""
+    if await collection.find_one(filter_query, {"_id": 1}):
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="The resource has been modified"
+        )
@@ -1,11 +1,29 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Depends
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
+import time
 import uvicorn
 import os
 
-from routers import auth, users, projects, tasks
-from database import connect_to_mongo, close_mongo_connection, check_database_connection
+from routers import auth, users, projects, tasks, changes, sync
+from database import (
+    connect_to_mongo, close_mongo_connection, check_database_connection, ensure_indexes, warm_up_pool, pool_stats
+)
+from auth.principal_cache import principal_cache
+from auth.revocations import revocation_table, run_revocation_refresher
+from auth.auth_handler import password_hasher_stats, shutdown_password_executor, warm_up_password_hasher
+from migrations import load_schema_version
+from repositories import init_repositories
+from project_reaper import run_project_reaper
+from change_feed import change_feed_hub
+from cache import response_cache
+from config import settings
+from metrics import MetricsMiddleware, Gauge, register, render
+from compression import CompressionMiddleware, default_levels
+from ratelimit import RateLimit, LoadShedder, loop_lag_monitor, bucket_backend, limiter_stats
+from ratelimit import stats as rate_limit_stats
 import logging
 logging.basicConfig(level=logging.INFO)
 
@@ -13,12 +31,42 @@ logging.basicConfig(level=logging.INFO)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     
-    # Startup event
+    # Startup event: the only place the MongoDB connection is opened
+    started = time.perf_counter()
     await connect_to_mongo()
+    init_repositories(app)
+    # bcrypt loads in its own thread while the independent startup queries run side by side
+    password_warm_up = asyncio.create_task(warm_up_password_hasher())
+    await asyncio.gather(
+        ensure_indexes(),
+        load_schema_version(),
+        refresh_revocation_table(),
+        warm_up_pool(settings.MONGO_WARM_UP_CONNECTIONS)
+    )
+    logging.info(f"Startup completed in {(time.perf_counter() - started) * 1000:.0f} ms")
+    revocation_refresher = asyncio.create_task(run_revocation_refresher())
+    loop_lag_monitor.start()
+    reaper = asyncio.create_task(run_project_reaper()) if settings.PROJECT_REAPER_ENABLED else None
     yield
     
     # Shutdown event
+    password_warm_up.cancel()
+    revocation_refresher.cancel()
+    await loop_lag_monitor.stop()
+    await bucket_backend.close()
+    if reaper:
+        reaper.cancel()
+    await change_feed_hub.stop()
+    await response_cache.close()
     await close_mongo_connection()
+    shutdown_password_executor()
+
+async def refresh_revocation_table():
+    try:
+        await revocation_table.refresh()
+    except Exception as e:
+        # Until a refresh succeeds, stateless auth falls back to loading the user
+        logging.error(f"Error loading the token revocation table: {e}")
 
 app = FastAPI(
     title="Task Management API",
@@ -34,13 +82,52 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Pagination cursors and ETags are read by the browser frontend
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        routes=app.routes,
+        minimum_size=settings.COMPRESSION_MIN_SIZE,
+        levels=default_levels(),
+        route_levels={
+            # Task lists are the largest responses and are often streamed; cheaper levels keep up with the cursor
+            "/api/tasks": {"gzip": 4, "br": 3, "zstd": 3},
+        }
+    )
+
+app.add_middleware(MetricsMiddleware, routes=app.routes)
+
+# Load shedding and rate limits, per router. Login and register run bcrypt, so they
+# are limited per address and shed first; the rest is limited per user.
+auth_limits = [
+    Depends(LoadShedder("auth", max_lag_ms=settings.LOAD_SHED_AUTH_MAX_LAG_MS)),
+    Depends(RateLimit(
+        "auth",
+        per_second=settings.RATE_LIMIT_AUTH_PER_MINUTE / 60,
+        burst=settings.RATE_LIMIT_AUTH_BURST,
+        per="ip"
+    )),
+]
+api_limits = [
+    Depends(LoadShedder("api", max_lag_ms=settings.LOAD_SHED_API_MAX_LAG_MS)),
+    Depends(RateLimit(
+        "api",
+        per_second=settings.RATE_LIMIT_API_PER_SECOND,
+        burst=settings.RATE_LIMIT_API_BURST,
+        per="user"
+    )),
+]
+
 # Include routes
-app.include_router(auth.router, prefix="/api")
-app.include_router(users.router, prefix="/api")
-app.include_router(projects.router, prefix="/api")
-app.include_router(tasks.router, prefix="/api")
+app.include_router(auth.router, prefix="/api", dependencies=auth_limits)
+app.include_router(users.router, prefix="/api", dependencies=api_limits)
+app.include_router(projects.router, prefix="/api", dependencies=api_limits)
+app.include_router(tasks.router, prefix="/api", dependencies=api_limits)
+app.include_router(sync.router, prefix="/api", dependencies=api_limits)
+app.include_router(changes.router)
 
 @app.get("/")
 async def root():
@@ -55,13 +142,49 @@ async def health_check():
     db_status = await check_database_connection()
     return {
         "api_status": "online",
-        "database": db_status
+        "database": db_status,
+        "mongo_pool": pool_stats.stats(),
+        "principal_cache": principal_cache.stats(),
+        "password_hasher": password_hasher_stats.stats(),
+        "change_feed": change_feed_hub.stats(),
+        "response_cache": response_cache.stats(),
+        "token_revocations": revocation_table.stats(),
+        "rate_limit": rate_limit_stats()
+    }
+
+component_stats = register(Gauge(
+    "component_stat", "Numeric statistics of internal components, as in /api/health", ("component", "stat")
+))
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    components = {
+        "mongo_pool": pool_stats.stats(),
+        "principal_cache": principal_cache.stats(),
+        "password_hasher": password_hasher_stats.stats(),
+        "change_feed": change_feed_hub.stats(),
+        "response_cache": response_cache.stats(),
+        "token_revocations": revocation_table.stats(),
+        "event_loop": loop_lag_monitor.stats(),
+        **{f"rate_limit_{name}": counters for name, counters in limiter_stats.items()}
     }
+    for component, stats in components.items():
+        for stat, value in stats.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                component_stats.set(component, stat, value=value)
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     
-    port = int(os.environ.get("PORT", 8000))
     is_render = os.environ.get("RENDER", "").lower() == "true"
     host = "0.0.0.0" if is_render else "localhost"
 
-    uvicorn.run("main:app", host=host, port=port, reload=True)
\ No newline at end of file
+    # Single-process development server; production runs serve.py. SERVER_RELOAD=true restarts on changes.
+    uvicorn.run(
+        "main:app",
+        host=host,
+        port=settings.SERVER_PORT,
+        reload=settings.SERVER_RELOAD,
+        proxy_headers=True,
+        forwarded_allow_ips=settings.SERVER_FORWARDED_ALLOW_IPS
+    )
\ No newline at end of file
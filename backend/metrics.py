@@ -0,0 +1,239 @@
+"""In-process metrics in the Prometheus text format, served at /metrics.
+
+MetricsMiddleware records, per route template (not per raw path, to keep
+the number of series bounded):
+
+- http_requests_total{method,route,status}
+- http_request_duration_seconds{method,route}, a histogram
+- http_request_db_seconds{method,route}, the part of a request spent
+  waiting on MongoDB, so the rest is Python time
+- http_requests_in_flight{method,route}
+
+CommandMetrics, registered on the Motor client, counts every driver
+command per collection and command name with its duration. Motor runs
+driver calls in threads with a copy of the caller's context, so the
+command durations reach the request that issued them through a
+contextvar.
+
+Metrics are per process; with several workers, scrape each one.
+"""
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from pymongo import monitoring
+from starlette.routing import Match
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in zip(names, values)) + "}"
+
+class Metric:
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        with self.lock:
+            values = dict(self.values)
+        return self.header() + [
+            f"{self.name}{format_labels(self.labels, labels)} {value}" for labels, value in values.items()
+        ]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value: float):
+        with self.lock:
+            self.values[labels] = value
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, *labels, value: float):
+        with self.lock:
+            series = self.values.get(labels)
+            if series is None:
+                # Per-bucket counts (the last one is +Inf), then the sum
+                series = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def render(self):
+        with self.lock:
+            values = {labels: (list(counts), total) for labels, (counts, total) in self.values.items()}
+        lines = self.header()
+        names = self.labels + ("le",)
+        for labels, (counts, total) in values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{format_labels(names, labels + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labels, labels)} {total}")
+            lines.append(f"{self.name}_count{format_labels(self.labels, labels)} {cumulative}")
+        return lines
+
+http_requests_total = Counter(
+    "http_requests_total", "HTTP requests by route and status code", ("method", "route", "status")
+)
+http_request_duration_seconds = Histogram(
+    "http_request_duration_seconds", "Time spent handling HTTP requests", ("method", "route")
+)
+http_request_db_seconds = Histogram(
+    "http_request_db_seconds", "Time HTTP requests spent waiting on MongoDB commands", ("method", "route")
+)
+http_requests_in_flight = Gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled", ("method", "route")
+)
+mongodb_commands_total = Counter(
+    "mongodb_commands_total", "MongoDB commands by collection, command and outcome", ("collection", "command", "outcome")
+)
+mongodb_command_duration_seconds = Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command round-trip time", ("collection", "command")
+)
+
+REGISTRY = [
+    http_requests_total,
+    http_request_duration_seconds,
+    http_request_db_seconds,
+    http_requests_in_flight,
+    mongodb_commands_total,
+    mongodb_command_duration_seconds,
+]
+
+def register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+class DatabaseTimer:
+    """Seconds of MongoDB command time accumulated by the current request"""
+
+    def __init__(self):
+        self.seconds = 0.0
+
+    def add(self, seconds: float):
+        self.seconds += seconds
+
+_database_timer = contextvars.ContextVar("database_timer", default=None)
+
+class CommandMetrics(monitoring.CommandListener):
+    """Counts and times driver commands; attributes their time to the current request"""
+
+    def __init__(self):
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def started(self, event):
+        command = event.command
+        # getMore names its collection in "collection", the other commands under their own name
+        collection = command.get("collection") if event.command_name == "getMore" else command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = "-"
+        with self.lock:
+            self.pending[(event.connection_id, event.request_id)] = collection
+
+    def finish(self, event, outcome: str):
+        with self.lock:
+            collection = self.pending.pop((event.connection_id, event.request_id), "-")
+        seconds = event.duration_micros / 1_000_000
+        mongodb_commands_total.inc(collection, event.command_name, outcome)
+        mongodb_command_duration_seconds.observe(collection, event.command_name, value=seconds)
+        timer = _database_timer.get()
+        if timer is not None:
+            timer.add(seconds)
+
+    def succeeded(self, event):
+        self.finish(event, "success")
+
+    def failed(self, event):
+        self.finish(event, "failure")
+
+command_metrics = CommandMetrics()
+
+def route_label(routes, scope):
+    """Path template of the route serving scope, e.g. /api/tasks/{task_id}"""
+    partial = None
+    for route in routes:
+        path = getattr(route, "path", None)
+        if path is None:
+            continue
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return path
+        if match == Match.PARTIAL and partial is None:
+            partial = path
+    # Unmatched paths share one label, so scanners cannot create unbounded series
+    return partial or "unmatched"
+
+class MetricsMiddleware:
+    """Pure ASGI middleware: no extra task or body buffering, so streaming responses are unaffected.
+
+    routes is the application's live route list; the route is resolved up
+    front so the in-flight gauge uses the same label as the other metrics.
+    """
+
+    def __init__(self, app, routes):
+        self.app = app
+        self.routes = routes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        route = route_label(self.routes, scope)
+        status_code = 500
+        timer = DatabaseTimer()
+        token = _database_timer.set(timer)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc(method, route)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _database_timer.reset(token)
+            http_requests_in_flight.dec(method, route)
+            http_requests_total.inc(method, route, str(status_code))
+            http_request_duration_seconds.observe(method, route, value=elapsed)
+            http_request_db_seconds.observe(method, route, value=timer.seconds)
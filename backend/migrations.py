@@ -0,0 +1,114 @@
+"""Schema versioning and one-time data migrations.
+
+Run pending migrations once per deploy (from backend/):
+    python -m migrations
+"""
+import asyncio
+import logging
+from pymongo import UpdateMany
+from rollups import rebuild_project_stats
+from database import (
+    connect_to_mongo, close_mongo_connection, get_projects_collection, get_tasks_collection, get_meta_collection
+)
+
+# 1: legacy projects may store their owner in user_id
+# 2: every project stores its owner in author_id
+# 3: every task stores the owner of its project in project_owner_id
+# 4: every project has a task statistics rollup in project_stats
+SCHEMA_VERSION = 4
+
+# Cached at startup so request handlers never query the schema version
+_schema_version = 1
+
+async def load_schema_version():
+    global _schema_version
+    meta_collection = get_meta_collection()
+    meta = await meta_collection.find_one({"_id": "schema"})
+    _schema_version = meta["version"] if meta else 1
+    if _schema_version < SCHEMA_VERSION:
+        logging.warning(
+            f"Database schema is at version {_schema_version}, expected {SCHEMA_VERSION}. "
+            "Run `python -m migrations` to migrate."
+        )
+    return _schema_version
+
+def schema_at_least(version: int):
+    return _schema_version >= version
+
+def project_owner_id(project):
+    """Return the owner of a project document, whatever schema version it was written with"""
+    return project.get("author_id", project.get("user_id"))
+
+def project_owner_filter(user_id: str):
+    """Filter matching the projects owned by user_id"""
+    if _schema_version >= 2:
+        return {"author_id": user_id}
+    return {"$or": [{"author_id": user_id}, {"user_id": user_id}]}
+
+async def migrate_project_author_id():
+    """Version 2: move legacy project owners from user_id to author_id"""
+    projects_collection = get_projects_collection()
+    result = await projects_collection.update_many(
+        {"user_id": {"$exists": True}},
+        [
+            {"$set": {"author_id": {"$ifNull": ["$author_id", "$user_id"]}}},
+            {"$project": {"user_id": 0}}
+        ]
+    )
+    logging.info(f"Normalised the owner of {result.modified_count} projects")
+
+async def migrate_task_project_owner_id(batch_size: int = 1000):
+    """Version 3: copy each project's owner onto its tasks"""
+    projects_collection = get_projects_collection()
+    tasks_collection = get_tasks_collection()
+
+    operations = []
+    modified = 0
+    async for project in projects_collection.find({}, {"author_id": 1, "user_id": 1}):
+        operations.append(UpdateMany(
+            {"project_id": str(project["_id"])},
+            {"$set": {"project_owner_id": project_owner_id(project)}}
+        ))
+        if len(operations) >= batch_size:
+            modified += (await tasks_collection.bulk_write(operations, ordered=False)).modified_count
+            operations = []
+    if operations:
+        modified += (await tasks_collection.bulk_write(operations, ordered=False)).modified_count
+
+    logging.info(f"Set the project owner on {modified} tasks")
+
+MIGRATIONS = {
+    2: migrate_project_author_id,
+    3: migrate_task_project_owner_id,
+    4: rebuild_project_stats,
+}
+
+async def run_migrations():
+    global _schema_version
+    meta_collection = get_meta_collection()
+    current_version = await load_schema_version()
+
+    for version in sorted(MIGRATIONS):
+        if version <= current_version:
+            continue
+        logging.info(f"Migrating database schema to version {version}")
+        await MIGRATIONS[version]()
+        await meta_collection.update_one(
+            {"_id": "schema"},
+            {"$set": {"version": version}},
+            upsert=True
+        )
+        _schema_version = version
+
+    logging.info(f"Database schema is at version {_schema_version}")
+
+async def main():
+    await connect_to_mongo()
+    try:
+        await run_migrations()
+    finally:
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -1,6 +1,6 @@
 from datetime import datetime
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Dict
 from enum import Enum
 from bson import ObjectId
 
@@ -54,4 +54,19 @@ class ProjectUpdate(BaseModel):
     description: Optional[str] = None
     deadline: Optional[datetime] = None
     status: Optional[ProjectStatus] = None
-    assigned_by: Optional[str] = None
\ No newline at end of file
+    assigned_by: Optional[str] = None
+
+class ProjectStats(BaseModel):
+    project_id: str
+    total: int
+    by_status: Dict[str, int]
+    by_priority: Dict[str, int]
+    overdue: int
+
+class ProjectDeletionStatus(BaseModel):
+    project_id: str
+    status: str
+    requested_at: datetime
+    tasks_deleted: int
+    tasks_total: Optional[int] = None
+    completed_at: Optional[datetime] = None
\ No newline at end of file
@@ -1,6 +1,6 @@
 from datetime import datetime
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, field_validator
+from typing import Optional, List
 from enum import Enum
 from bson import ObjectId
 
@@ -25,6 +25,14 @@ class TaskPriority(str, Enum):
     MEDIUM = "Medium"
     HIGH = "High"
 
+class TaskSort(str, Enum):
+    DUE_DATE = "due_date"
+    DUE_DATE_DESC = "-due_date"
+    CREATED_AT = "created_at"
+    CREATED_AT_DESC = "-created_at"
+    UPDATED_AT = "updated_at"
+    UPDATED_AT_DESC = "-updated_at"
+
 class TaskBase(BaseModel):
     title: str
     description: str
@@ -48,6 +56,8 @@ class TaskInDB(TaskBase):
         json_encoders = {ObjectId: str}
 
 class TaskResponse(TaskBase):
+    # Required on create, but tasks written directly to the database may have none
+    due_date: Optional[datetime] = None
     id: str
     created_by: str
     created_at: datetime
@@ -62,4 +72,33 @@ class TaskUpdate(BaseModel):
     due_date: Optional[datetime] = None
     status: Optional[TaskStatus] = None
     priority: Optional[TaskPriority] = None
-    assigned_to: Optional[str] = None
\ No newline at end of file
+    assigned_to: Optional[str] = None
+
+    @field_validator("title", "description", "due_date", "status", "priority")
+    @classmethod
+    def not_null(cls, value):
+        # Omitted fields are left as they are; only assigned_to can be cleared with null
+        if value is None:
+            raise ValueError("cannot be null")
+        return value
+
+class TaskBatchAction(str, Enum):
+    CREATE = "create"
+    UPDATE = "update"
+    DELETE = "delete"
+
+class TaskBatchOperation(BaseModel):
+    op: TaskBatchAction
+    id: Optional[str] = None
+    task: Optional[TaskCreate] = None
+    changes: Optional[TaskUpdate] = None
+
+class TaskBatchRequest(BaseModel):
+    operations: List[TaskBatchOperation]
+
+class TaskBatchResult(BaseModel):
+    index: int
+    op: TaskBatchAction
+    id: Optional[str] = None
+    status: int
+    detail: Optional[str] = None
\ No newline at end of file
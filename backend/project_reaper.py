@@ -0,0 +1,125 @@
+"""Background removal of the tasks of soft-deleted projects.
+
+DELETE /api/projects/{id} only marks the project with deleted_at and a
+deletion record, and its tasks with project_deleted_at, which hides them
+from every task read and write at once. This reaper, started from the lifespan in main.py, claims
+marked projects one at a time and removes their tasks in rate-limited
+batches, recording progress on the project so it can be polled through
+GET /api/projects/{id}/deletion. A lease on the claim lets several workers
+run the reaper without deleting the same project twice.
+"""
+import asyncio
+import logging
+from datetime import timedelta
+from pymongo import ReturnDocument
+from config import settings
+from database import get_projects_collection, get_tasks_collection, get_project_stats_collection, utcnow
+from cache import response_cache
+from tombstones import record_tombstones, task_audience
+
+# Matches projects that have not been soft-deleted; served by the (owner, deleted_at) indexes
+ACTIVE_PROJECT_FILTER = {"deleted_at": None}
+# Matches tasks whose project has not been soft-deleted; part of every task access filter
+ACTIVE_TASK_FILTER = {"project_deleted_at": None}
+
+DELETION_PENDING = "pending"
+DELETION_IN_PROGRESS = "in_progress"
+DELETION_COMPLETED = "completed"
+
+def deletion_record(now):
+    return {
+        "status": DELETION_PENDING,
+        "requested_at": now,
+        "tasks_deleted": 0,
+        "tasks_total": None,
+        "completed_at": None
+    }
+
+# Oldest deletion request first
+CLAIM_SORT = [("deletion.requested_at", 1)]
+
+def claimable_filter(now):
+    """Projects whose tasks still have to be removed and whose lease, if any, has run out"""
+    return {
+        "deletion.status": {"$in": [DELETION_PENDING, DELETION_IN_PROGRESS]},
+        "$or": [
+            {"deletion.lease_until": {"$exists": False}},
+            {"deletion.lease_until": {"$lt": now}}
+        ]
+    }
+
+async def claim_deleted_project():
+    """Take the lease on one project whose tasks still have to be removed"""
+    projects_collection = get_projects_collection()
+    now = utcnow()
+    return await projects_collection.find_one_and_update(
+        claimable_filter(now),
+        {"$set": {
+            "deletion.status": DELETION_IN_PROGRESS,
+            "deletion.lease_until": now + timedelta(seconds=settings.PROJECT_REAPER_LEASE_SECONDS)
+        }},
+        sort=CLAIM_SORT,
+        return_document=ReturnDocument.AFTER
+    )
+
+async def purge_project_tasks(project):
+    projects_collection = get_projects_collection()
+    tasks_collection = get_tasks_collection()
+    project_stats_collection = get_project_stats_collection()
+    project_id = str(project["_id"])
+
+    # The rollup already knows how many tasks there are, so progress costs no count
+    if project["deletion"].get("tasks_total") is None:
+        rollup = await project_stats_collection.find_one({"_id": project_id}, {"total": 1})
+        await projects_collection.update_one(
+            {"_id": project["_id"]},
+            {"$set": {"deletion.tasks_total": rollup.get("total", 0) if rollup else 0}}
+        )
+
+    while True:
+        batch = [
+            task
+            async for task in tasks_collection.find(
+                {"project_id": project_id}, {"project_owner_id": 1, "assigned_to": 1}
+            ).limit(settings.PROJECT_REAPER_BATCH_SIZE)
+        ]
+        if not batch:
+            break
+
+        task_ids = [task["_id"] for task in batch]
+        result = await tasks_collection.delete_many({"_id": {"$in": task_ids}})
+        await response_cache.invalidate("task", *(str(task_id) for task_id in task_ids))
+        await record_tombstones("tasks", [(task["_id"], task_audience(task)) for task in batch])
+        await projects_collection.update_one(
+            {"_id": project["_id"]},
+            {
+                "$inc": {"deletion.tasks_deleted": result.deleted_count},
+                "$set": {"deletion.lease_until": utcnow() + timedelta(seconds=settings.PROJECT_REAPER_LEASE_SECONDS)}
+            }
+        )
+        # Leave room for foreground traffic on the primary
+        await asyncio.sleep(settings.PROJECT_REAPER_BATCH_DELAY_SECONDS)
+
+    await project_stats_collection.delete_one({"_id": project_id})
+    await projects_collection.update_one(
+        {"_id": project["_id"]},
+        {
+            "$set": {"deletion.status": DELETION_COMPLETED, "deletion.completed_at": utcnow()},
+            "$unset": {"deletion.lease_until": ""}
+        }
+    )
+    logging.info(f"Removed the tasks of deleted project {project_id}")
+
+async def run_project_reaper():
+    logging.info("Project reaper started")
+    while True:
+        try:
+            project = await claim_deleted_project()
+            if project:
+                await purge_project_tasks(project)
+                continue
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"Error reaping deleted projects: {e}")
+        await asyncio.sleep(settings.PROJECT_REAPER_IDLE_SECONDS)
@@ -0,0 +1,209 @@
+"""Per-client rate limits and event-loop-lag load shedding.
+
+Both are FastAPI dependencies attached to whole routers in main.py, e.g.
+
+    app.include_router(auth.router, prefix="/api", dependencies=[
+        Depends(LoadShedder("auth", max_lag_ms=100)),
+        Depends(RateLimit("auth", per_second=0.5, burst=10, per="ip")),
+    ])
+
+so they run after routing but before the handler does any work (bcrypt,
+MongoDB). They answer 429 or 503 with Retry-After.
+
+RateLimit keeps one token bucket per client: per="ip" keys on the client
+address, which uvicorn takes from X-Forwarded-For only when the request
+comes from SERVER_FORWARDED_ALLOW_IPS (behind a proxy that is not listed
+there, every client shares the proxy's bucket); per="user" keys on the
+user id of a validly signed bearer token, falling back to the address.
+Buckets live in a bounded in-process LRU, or with
+RATE_LIMIT_BACKEND=redis in a shared Redis so limits hold across workers;
+a Redis outage lets requests through rather than failing them.
+
+LoadShedder rejects requests while the event loop lags behind by more
+than max_lag_ms, i.e. when the process already has more work than it
+can schedule, so latency degrades into fast 503s instead of timeouts.
+The lag is sampled by LoopLagMonitor, started in the lifespan.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from fastapi import HTTPException, Request, status
+from auth.auth_handler import decode_token
+from config import settings
+
+class MemoryBucketBackend:
+    """Token buckets as [tokens, last refill] in an LRU bounded to max_keys"""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+
+    async def take(self, key: str, per_second: float, burst: int):
+        """Take one token; returns (allowed, seconds until a token is available)"""
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [float(burst), now]
+            # An evicted client starts over with a full bucket
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * per_second)
+            bucket[1] = now
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return True, 0.0
+        return False, (1 - bucket[0]) / per_second
+
+    async def close(self):
+        self._buckets.clear()
+
+    def stats(self):
+        return {"keys": len(self._buckets), "max_keys": self.max_keys}
+
+# KEYS[1] bucket; ARGV rate per second, burst. Uses the server clock so every worker agrees.
+TAKE_SCRIPT = """
+local now = redis.call("TIME")
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "updated")
+local tokens = tonumber(bucket[1]) or burst
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + (now - updated) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "updated", tostring(now))
+redis.call("PEXPIRE", KEYS[1], math.ceil(burst / rate * 1000))
+return {allowed, tostring(tokens)}
+"""
+
+class RedisBucketBackend:
+    def __init__(self, url: str):
+        try:
+            from redis import asyncio as redis
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis needs the redis package: pip install redis")
+        self.client = redis.from_url(url)
+        self.take_script = self.client.register_script(TAKE_SCRIPT)
+
+    async def take(self, key: str, per_second: float, burst: int):
+        allowed, tokens = await self.take_script(keys=[f"ratelimit:{key}"], args=[per_second, burst])
+        if allowed:
+            return True, 0.0
+        return False, (1 - float(tokens)) / per_second
+
+    async def close(self):
+        await self.client.aclose()
+
+    def stats(self):
+        return {}
+
+def create_backend():
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        return RedisBucketBackend(settings.RATE_LIMIT_URL)
+    return MemoryBucketBackend(settings.RATE_LIMIT_MAX_KEYS)
+
+bucket_backend = create_backend()
+
+class LoopLagMonitor:
+    """Samples how late a short sleep wakes up, i.e. how long ready callbacks wait for the loop"""
+
+    def __init__(self, interval_seconds: float):
+        self.interval_seconds = interval_seconds
+        self.lag_ms = 0.0
+        self.max_lag_ms = 0.0
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval_seconds)
+            lag_ms = max(0.0, (time.perf_counter() - started - self.interval_seconds) * 1000)
+            # Rises at once, decays over a few samples, so one slow tick does not flap the shedder
+            self.lag_ms = lag_ms if lag_ms > self.lag_ms else self.lag_ms * 0.7 + lag_ms * 0.3
+            self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+
+    def stats(self):
+        return {"lag_ms": round(self.lag_ms, 2), "max_lag_ms": round(self.max_lag_ms, 2)}
+
+loop_lag_monitor = LoopLagMonitor(settings.LOAD_SHED_SAMPLE_INTERVAL_MS / 1000)
+
+# Counters by limiter name, for /api/health and /metrics
+limiter_stats = {}
+
+def count(name: str, outcome: str):
+    counters = limiter_stats.setdefault(name, {"allowed": 0, "limited": 0, "shed": 0, "errors": 0})
+    counters[outcome] += 1
+
+def client_key(request: Request, per: str):
+    if per == "user":
+        authorization = request.headers.get("authorization", "")
+        scheme, _, token = authorization.partition(" ")
+        if scheme.lower() == "bearer" and token:
+            try:
+                return "user:" + decode_token(token)["user_id"]
+            except Exception:
+                # JWTBearer rejects the token itself; meanwhile limit by address
+                pass
+    return "ip:" + (request.client.host if request.client else "unknown")
+
+class RateLimit:
+    def __init__(self, name: str, per_second: float, burst: int, per: str = "ip"):
+        self.name = name
+        self.per_second = per_second
+        self.burst = burst
+        self.per = per
+
+    async def __call__(self, request: Request):
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        key = f"{self.name}:{client_key(request, self.per)}"
+        try:
+            allowed, retry_after = await bucket_backend.take(key, self.per_second, self.burst)
+        except Exception as e:
+            count(self.name, "errors")
+            logging.warning(f"Rate limit backend unavailable, letting the request through: {e}")
+            return
+
+        if allowed:
+            count(self.name, "allowed")
+            return
+        count(self.name, "limited")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests, try again later",
+            headers={"Retry-After": str(max(1, round(retry_after)))},
+        )
+
+class LoadShedder:
+    def __init__(self, name: str, max_lag_ms: float):
+        self.name = name
+        self.max_lag_ms = max_lag_ms
+
+    async def __call__(self):
+        if self.max_lag_ms > 0 and loop_lag_monitor.lag_ms > self.max_lag_ms:
+            count(self.name, "shed")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is overloaded, try again shortly",
+                headers={"Retry-After": "1"},
+            )
+
+def stats():
+    return {"limiters": limiter_stats, "loop": loop_lag_monitor.stats(), **bucket_backend.stats()}
@@ -0,0 +1,172 @@
+"""Typed access to the users, projects and tasks collections.
+
+The repositories are created once in the app lifespan, after the MongoDB
+client has connected, and handed to the routers through the get_*_repo
+dependencies. Handlers therefore never check or open the connection
+themselves, and queries shared by several routes live in one place.
+"""
+from bson import ObjectId
+from fastapi.requests import HTTPConnection
+from pymongo import ReturnDocument
+from database import get_database, with_list_read_preference
+from migrations import project_owner_id, project_owner_filter
+from project_reaper import ACTIVE_PROJECT_FILTER, ACTIVE_TASK_FILTER, deletion_record
+
+class Repository:
+    collection_name = None
+
+    def __init__(self, database):
+        self.collection = database[self.collection_name]
+        # Listings may be served by a secondary (MONGO_LIST_READ_PREFERENCES)
+        self.list_collection = with_list_read_preference(self.collection)
+
+    async def insert(self, document):
+        """Insert document; insert_one sets its _id, so it can be echoed back without a re-read"""
+        await self.collection.insert_one(document)
+        return document
+
+    async def page(self, filter_query, after_id=None, limit: int = 0, projection=None):
+        """Documents matching filter_query in _id order, starting after after_id"""
+        if after_id is not None:
+            after = {"_id": {"$gt": after_id}}
+            filter_query = {"$and": [filter_query, after]} if filter_query else after
+        cursor = self.list_collection.find(filter_query, projection).sort("_id", 1).limit(limit)
+        return await cursor.to_list(length=None)
+
+    async def exists(self, filter_query) -> bool:
+        return await self.collection.find_one(filter_query, {"_id": 1}) is not None
+
+    async def update(self, filter_query, changes, expected_updated_at=None, return_document=ReturnDocument.AFTER):
+        """$set changes on the document matching filter_query.
+
+        With expected_updated_at (from If-Match) the write only applies to
+        that version of the document. Returns None when nothing matched.
+        """
+        if expected_updated_at:
+            filter_query = {**filter_query, "updated_at": expected_updated_at}
+        return await self.collection.find_one_and_update(
+            filter_query,
+            {"$set": changes},
+            return_document=return_document
+        )
+
+class UserRepo(Repository):
+    collection_name = "users"
+
+    async def get(self, user_id: str):
+        return await self.collection.find_one({"_id": ObjectId(user_id)})
+
+    async def get_by_email(self, email: str):
+        return await self.collection.find_one({"email": email})
+
+    async def list(self, filter_query=None):
+        return await self.list_collection.find(filter_query or {}).to_list(length=None)
+
+    async def delete(self, user_id: str) -> bool:
+        result = await self.collection.delete_one({"_id": ObjectId(user_id)})
+        return result.deleted_count > 0
+
+    async def increment_token_version(self, user_id: str, now):
+        """Invalidate every token issued so far; returns the updated user, or None"""
+        return await self.collection.find_one_and_update(
+            {"_id": ObjectId(user_id)},
+            {"$inc": {"token_version": 1}, "$set": {"updated_at": now}},
+            return_document=ReturnDocument.AFTER
+        )
+
+class ProjectRepo(Repository):
+    collection_name = "projects"
+
+    def visible_filter(self, payload):
+        """Active projects the caller may see: all for admins, otherwise their own"""
+        if payload["role"] == "admin":
+            return dict(ACTIVE_PROJECT_FILTER)
+        return {**project_owner_filter(payload["user_id"]), **ACTIVE_PROJECT_FILTER}
+
+    async def list(self, filter_query, projection=None):
+        return [project async for project in self.list_collection.find(filter_query, projection)]
+
+    async def list_ids(self, filter_query):
+        return [str(project["_id"]) async for project in self.list_collection.find(filter_query, {"_id": 1})]
+
+    async def get_active(self, project_id: str, projection=None):
+        return await self.collection.find_one({"_id": ObjectId(project_id), **ACTIVE_PROJECT_FILTER}, projection)
+
+    async def get(self, project_id: str, projection=None):
+        """Any project, including soft-deleted ones"""
+        return await self.collection.find_one({"_id": ObjectId(project_id)}, projection)
+
+    async def exists_active(self, project_id: str) -> bool:
+        return await self.exists({"_id": ObjectId(project_id), **ACTIVE_PROJECT_FILTER})
+
+    async def soft_delete(self, project_id: str, owner_id: str, now):
+        """Hide an owner's project and queue its tasks for the project reaper; None if nothing matched"""
+        return await self.collection.find_one_and_update(
+            {"_id": ObjectId(project_id), **ACTIVE_PROJECT_FILTER, **project_owner_filter(owner_id)},
+            {"$set": {"deleted_at": now, "updated_at": now, "deletion": deletion_record(now)}},
+            projection={"_id": 1}
+        )
+
+    async def owners(self, project_ids):
+        """Owner of each active project in project_ids, in one query"""
+        owners = {}
+        async for project in self.collection.find(
+            {"_id": {"$in": [ObjectId(project_id) for project_id in project_ids]}, **ACTIVE_PROJECT_FILTER},
+            {"author_id": 1, "user_id": 1}
+        ):
+            owners[str(project["_id"])] = project_owner_id(project)
+        return owners
+
+class TaskRepo(Repository):
+    collection_name = "tasks"
+
+    def find(self, filter_query, projection, sort=None):
+        """Cursor over a task listing, read with the list read preference"""
+        cursor = self.list_collection.find(filter_query, projection)
+        return cursor.sort(sort) if sort else cursor
+
+    async def get_active(self, task_id: str):
+        """A task, unless its project has been soft-deleted"""
+        return await self.collection.find_one({"_id": ObjectId(task_id), **ACTIVE_TASK_FILTER})
+
+    async def get_many(self, task_ids, projection):
+        """Tasks by id, keyed by their string id"""
+        return {
+            str(task["_id"]): task
+            async for task in self.collection.find({"_id": {"$in": list(task_ids)}}, projection)
+        }
+
+    async def hide_project_tasks(self, project_id: str, now):
+        """Mark the tasks of a soft-deleted project, so they drop out of every task query"""
+        await self.collection.update_many(
+            {"project_id": project_id, **ACTIVE_TASK_FILTER},
+            {"$set": {"project_deleted_at": now}}
+        )
+
+    async def project_task_ids(self, project_id: str):
+        return [str(task["_id"]) async for task in self.collection.find({"project_id": project_id}, {"_id": 1})]
+
+    async def delete(self, filter_query, projection=None):
+        """Delete the task matching filter_query and return it, or None"""
+        return await self.collection.find_one_and_delete(filter_query, projection=projection)
+
+    async def bulk_write(self, requests):
+        return await self.collection.bulk_write(requests, ordered=False)
+
+def init_repositories(app):
+    """Build the repositories on app.state; call once connect_to_mongo has run"""
+    database = get_database()
+    app.state.users = UserRepo(database)
+    app.state.projects = ProjectRepo(database)
+    app.state.tasks = TaskRepo(database)
+
+# FastAPI dependencies. HTTPConnection serves both HTTP and WebSocket routes.
+
+async def get_user_repo(connection: HTTPConnection) -> UserRepo:
+    return connection.app.state.users
+
+async def get_project_repo(connection: HTTPConnection) -> ProjectRepo:
+    return connection.app.state.projects
+
+async def get_task_repo(connection: HTTPConnection) -> TaskRepo:
+    return connection.app.state.tasks
@@ -0,0 +1,161 @@
+"""Per-project task statistics kept up to date incrementally.
+
+Each project has one document in project_stats:
+
+    {"_id": project_id, "total": n,
+     "by_status": {status: n}, "by_priority": {priority: n},
+     "open_due_by_day": {"YYYY-MM-DD": n}}
+
+Task writes adjust it with $inc, so reading a project's statistics costs one
+lookup however many tasks it has. open_due_by_day counts the tasks that are
+not completed per due day, which lets the overdue count follow the clock
+without rewriting anything.
+
+Rebuild every rollup from the tasks collection (from backend/):
+    python -m rollups
+"""
+import asyncio
+import logging
+from collections import Counter, defaultdict
+from datetime import datetime
+from pymongo import UpdateOne, ReplaceOne
+from database import connect_to_mongo, close_mongo_connection, get_project_stats_collection, get_tasks_collection
+from models.task import TaskStatus, TaskPriority
+
+# Fields a task contributes to its project's rollup
+ROLLUP_FIELDS = ("project_id", "status", "priority", "due_date")
+
+def task_counters(task):
+    """Rollup counters a single task contributes to"""
+    counters = {
+        "total": 1,
+        f"by_status.{task['status']}": 1,
+        f"by_priority.{task['priority']}": 1,
+    }
+    # Tasks without a due date can never be overdue
+    if task["status"] != TaskStatus.COMPLETED.value and task.get("due_date") is not None:
+        counters[f"open_due_by_day.{task['due_date'].strftime('%Y-%m-%d')}"] = 1
+    return counters
+
+def rollup_changed(before, after):
+    return any(before.get(field) != after.get(field) for field in ROLLUP_FIELDS)
+
+class RollupDelta:
+    """Accumulates counter changes for several projects and applies them in one bulk write"""
+
+    def __init__(self):
+        self.changes = defaultdict(Counter)
+
+    def add(self, task, sign: int = 1):
+        counters = self.changes[task["project_id"]]
+        for field, value in task_counters(normalize(task)).items():
+            counters[field] += sign * value
+
+    def remove(self, task):
+        self.add(task, -1)
+
+    def change(self, before, after):
+        if rollup_changed(before, after):
+            self.remove(before)
+            self.add(after)
+
+    async def apply(self):
+        requests = []
+        for project_id, counters in self.changes.items():
+            increments = {field: value for field, value in counters.items() if value}
+            if increments:
+                requests.append(UpdateOne({"_id": project_id}, {"$inc": increments}, upsert=True))
+        if requests:
+            project_stats_collection = get_project_stats_collection()
+            await project_stats_collection.bulk_write(requests, ordered=False)
+
+def normalize(task):
+    """Enum members come from request models, plain strings from MongoDB"""
+    return {
+        **task,
+        "status": getattr(task["status"], "value", task["status"]),
+        "priority": getattr(task["priority"], "value", task["priority"]),
+    }
+
+async def record_task_created(task):
+    delta = RollupDelta()
+    delta.add(task)
+    await delta.apply()
+
+async def record_task_updated(before, after):
+    delta = RollupDelta()
+    delta.change(before, after)
+    await delta.apply()
+
+async def record_task_deleted(task):
+    delta = RollupDelta()
+    delta.remove(task)
+    await delta.apply()
+
+def stats_response(project_id: str, rollup, today=None):
+    rollup = rollup or {}
+    today = (today or datetime.utcnow()).strftime("%Y-%m-%d")
+    by_status = rollup.get("by_status", {})
+    by_priority = rollup.get("by_priority", {})
+    return {
+        "project_id": project_id,
+        "total": rollup.get("total", 0),
+        "by_status": {value.value: by_status.get(value.value, 0) for value in TaskStatus},
+        "by_priority": {value.value: by_priority.get(value.value, 0) for value in TaskPriority},
+        # Open tasks whose due day has already ended
+        "overdue": sum(count for day, count in rollup.get("open_due_by_day", {}).items() if day < today),
+    }
+
+async def get_project_stats(project_ids):
+    project_stats_collection = get_project_stats_collection()
+    rollups = {}
+    async for rollup in project_stats_collection.find({"_id": {"$in": list(project_ids)}}):
+        rollups[rollup["_id"]] = rollup
+    return rollups
+
+async def rebuild_project_stats(project_ids=None):
+    """Recompute the rollups of project_ids, or of every project, from the tasks collection"""
+    tasks_collection = get_tasks_collection()
+    project_stats_collection = get_project_stats_collection()
+
+    rollups = defaultdict(lambda: {"total": 0, "by_status": {}, "by_priority": {}, "open_due_by_day": {}})
+    scope = {} if project_ids is None else {"project_id": {"$in": list(project_ids)}}
+    groups = tasks_collection.aggregate([
+        {"$match": scope},
+        {"$group": {
+            "_id": {
+                "project_id": "$project_id",
+                "status": "$status",
+                "priority": "$priority",
+                "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$due_date"}}
+            },
+            "count": {"$sum": 1}
+        }}
+    ])
+    async for group in groups:
+        key = group["_id"]
+        rollup = rollups[key["project_id"]]
+        count = group["count"]
+        rollup["total"] += count
+        rollup["by_status"][key["status"]] = rollup["by_status"].get(key["status"], 0) + count
+        rollup["by_priority"][key["priority"]] = rollup["by_priority"].get(key["priority"], 0) + count
+        if key["status"] != TaskStatus.COMPLETED.value and key["day"] is not None:
+            rollup["open_due_by_day"][key["day"]] = rollup["open_due_by_day"].get(key["day"], 0) + count
+
+    # Projects in scope without any task left lose their rollup
+    await project_stats_collection.delete_many({"_id": {"$nin": list(rollups), **scope.get("project_id", {})}})
+    requests = [ReplaceOne({"_id": project_id}, rollup, upsert=True) for project_id, rollup in rollups.items()]
+    if requests:
+        await project_stats_collection.bulk_write(requests, ordered=False)
+    logging.info(f"Rebuilt task statistics for {len(requests)} projects")
+
+async def main():
+    await connect_to_mongo()
+    try:
+        await rebuild_project_stats()
+    finally:
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -2,20 +2,20 @@ from fastapi import APIRouter, HTTPException, status, Depends, Form
 from fastapi.security import OAuth2PasswordRequestForm
 from datetime import datetime, timedelta
 from models.user import UserCreate, UserResponse, UserInDB
-from auth.auth_handler import verify_password, get_password_hash, create_access_token
-from database import get_users_collection
+from auth.auth_handler import verify_password_async, get_password_hash_async, create_access_token
+from database import utcnow
+from repositories import UserRepo, get_user_repo
+from serializers import user_to_dict, json_response
 from config import settings
 from bson import ObjectId
+import logging
 
 router = APIRouter(tags=["authentication"])
 
 @router.post("/register", response_model=UserResponse)
-async def register(user: UserCreate):
-    # Get the users collection
-    users_collection = await get_users_collection()
-    
+async def register(user: UserCreate, users: UserRepo = Depends(get_user_repo)):
     # Check if the email is already registered
-    if await users_collection.find_one({"email": user.email}):
+    if await users.get_by_email(user.email):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered",
@@ -23,7 +23,7 @@ async def register(user: UserCreate):
     
     # Create a new user
     user_dict = user.model_dump()
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash_async(user.password)
     user_dict.pop("password")
     
     new_user = UserInDB(
@@ -34,31 +34,21 @@ async def register(user: UserCreate):
     user_data = new_user.model_dump(by_alias=True)
     if "_id" in user_data and not user_data["_id"]:
         del user_data["_id"]  
+    user_data["created_at"] = utcnow()
+    user_data["updated_at"] = user_data["created_at"]
     
-    result = await users_collection.insert_one(user_data)
-    
-    # Search for the newly created user to return
-    created_user = await users_collection.find_one({"_id": result.inserted_id})
+    created_user = await users.insert(user_data)
     
-    if created_user:
-        return {
-            "id": str(created_user["_id"]),
-            "name": created_user["name"],
-            "email": created_user["email"],
-            "role": created_user["role"],
-            "created_at": created_user["created_at"],
-            "updated_at": created_user["updated_at"]
-        }
+    return json_response(user_to_dict(created_user), UserResponse)
 
 @router.post("/login")
 async def login(
     username: str = Form(...),
     password: str = Form(...),
-    remember_me: bool = Form(False) 
+    remember_me: bool = Form(False),
+    users: UserRepo = Depends(get_user_repo)
 ):
-    users_collection = await get_users_collection()
-    
-    user = await users_collection.find_one({"email": username})
+    user = await users.get_by_email(username)
     
     if not user:
         raise HTTPException(
@@ -67,7 +57,7 @@ async def login(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    if not verify_password(password, user["hashed_password"]):
+    if not await verify_password_async(password, user["hashed_password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect password",
@@ -76,15 +66,15 @@ async def login(
     
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     if remember_me:  
-        access_token_expires = timedelta(days=30)
+        access_token_expires = timedelta(days=settings.REMEMBER_ME_EXPIRE_DAYS)
     
     access_token = create_access_token(
-        data={"user_id": str(user["_id"]), "role": user["role"]},
+        data={"user_id": str(user["_id"]), "role": user["role"], "token_version": user.get("token_version", 0)},
         expires_delta=access_token_expires
     )
 
     expiration_time = datetime.utcnow() + access_token_expires
-    print(f"The access token to user {username} expire in: {expiration_time}")
+    logging.info(f"Issued an access token for user {user['_id']} expiring at {expiration_time}")
 
     return {
         "access_token": access_token,
@@ -0,0 +1,85 @@
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, status
+from typing import Optional
+from auth.auth_bearer import JWTBearer
+from auth.revocations import revocation_table
+from change_feed import change_feed_hub
+from config import settings
+from serializers import dumps
+import asyncio
+
+router = APIRouter(tags=["changes"])
+
+@router.websocket("/ws/changes")
+async def changes_feed(websocket: WebSocket, token: Optional[str] = None, resume_after: Optional[str] = None):
+    """Push project and task changes visible to the caller.
+
+    Browsers cannot set headers on a WebSocket, so the JWT may be passed as
+    `token`. Messages are JSON arrays of events; each change carries a
+    `token` that can be sent back as `resume_after` after a reconnect. A
+    `resync` event means changes were lost and the client should refetch.
+
+    The token stays checked while the socket is open: its expiry and the
+    revocation table before every batch, its user every
+    CHANGE_FEED_REAUTH_SECONDS. Role changes apply to the subscription,
+    and the socket is closed with 1008 once the token is no longer valid.
+    """
+    authorization = websocket.headers.get("authorization", "")
+    if not token and authorization.startswith("Bearer "):
+        token = authorization[len("Bearer "):]
+
+    authenticator = JWTBearer()
+    try:
+        payload = await authenticator.authenticate(token or "")
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    subscriber = change_feed_hub.subscribe(payload, resume_after)
+
+    def check_token():
+        """Current claims of the token without a round-trip; raises once it expired or was revoked"""
+        payload = authenticator.verify_jwt(token)
+        if not payload:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Invalid token or expired token."
+            )
+        return revocation_table.check(payload)
+
+    async def send_events():
+        while True:
+            await subscriber.wait()
+            subscriber.update(check_token())
+            events = subscriber.take_events()
+            if events:
+                await websocket.send_text(dumps(events).decode())
+
+    async def reauthenticate():
+        # Catches deleted users, also when the revocation table is stale
+        while True:
+            await asyncio.sleep(settings.CHANGE_FEED_REAUTH_SECONDS)
+            subscriber.update(await authenticator.authenticate(token))
+
+    async def wait_for_disconnect():
+        # Client messages are ignored; reading is only how a close is noticed
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+
+    tasks = {
+        asyncio.create_task(send_events()),
+        asyncio.create_task(reauthenticate()),
+        asyncio.create_task(wait_for_disconnect()),
+    }
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        change_feed_hub.unsubscribe(subscriber)
+
+    if any(isinstance(task.exception(), HTTPException) for task in done):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
@@ -1,17 +1,26 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Request, Response
 from typing import List
-from models.project import ProjectCreate, ProjectResponse, ProjectUpdate, ProjectStatus
+from models.project import (
+    ProjectCreate, ProjectResponse, ProjectUpdate, ProjectStats, ProjectDeletionStatus
+)
 from auth.auth_bearer import JWTBearer
-from database import get_projects_collection, get_tasks_collection 
+from database import utcnow
+from repositories import ProjectRepo, TaskRepo, get_project_repo, get_task_repo
+from rollups import get_project_stats, stats_response
+from migrations import project_owner_id
+from serializers import project_to_dict, json_response
+from etags import (
+    document_etag, list_etag, revalidating, not_modified, if_match_updated_at, raise_if_modified, VERSION_PROJECTION
+)
+from cache import response_cache, visibility, cached_response
+from tombstones import record_tombstone
 from bson import ObjectId
 from datetime import datetime
 
 router = APIRouter(tags=["projects"])
 
 @router.post("/projects", response_model=ProjectResponse)
-async def create_project(project: ProjectCreate, payload=Depends(JWTBearer())):
-    projects_collection = await get_projects_collection()
-    
+async def create_project(project: ProjectCreate, projects: ProjectRepo = Depends(get_project_repo), payload=Depends(JWTBearer())):
     # Add user_id and timestamps
     project_dict = project.model_dump()
     
@@ -24,72 +33,46 @@ async def create_project(project: ProjectCreate, payload=Depends(JWTBearer())):
     if "deadline" not in project_dict:
         project_dict["deadline"] = datetime.utcnow()  # Default fallback
     
-    project_dict["created_at"] = datetime.utcnow()
-    project_dict["updated_at"] = datetime.utcnow()
+    project_dict["created_at"] = utcnow()
+    project_dict["updated_at"] = project_dict["created_at"]
     
-    result = await projects_collection.insert_one(project_dict)
+    created_project = await projects.insert(project_dict)
     
-    created_project = await projects_collection.find_one({"_id": result.inserted_id})
+    return json_response(project_to_dict(created_project), ProjectResponse)
+
+@router.get("/projects", response_model=List[ProjectResponse])
+async def get_projects(
+    request: Request,
+    response: Response,
+    projects: ProjectRepo = Depends(get_project_repo),
+    payload=Depends(JWTBearer())
+):
+    # If admin, return all projects, otherwise only user's projects
+    filter_query = projects.visible_filter(payload)
     
-    # Build response aligned with the ProjectResponse model
-    response = {
-        "id": str(created_project["_id"]),
-        "description": created_project["description"],
-        "status": created_project.get("status", ProjectStatus.PENDING),
-        "author_id": created_project["author_id"],
-        "assigned_by": created_project.get("assigned_by", None),
-        "created_at": created_project["created_at"],
-        "updated_at": created_project["updated_at"],
-        "deadline": created_project.get("deadline", datetime.utcnow()) 
-    }
+    if revalidating(request):
+        cached = not_modified(request, list_etag(await projects.list(filter_query, VERSION_PROJECTION), filter_query))
+        if cached:
+            return cached
     
-    if "name" in created_project:
-        response["name"] = created_project["name"]
+    project_list = await projects.list(filter_query)
+    response.headers["ETag"] = list_etag(project_list, filter_query)
+    content = [project_to_dict(project) for project in project_list]
     
-    return response
+    return json_response(content, List[ProjectResponse], response)
 
-@router.get("/projects", response_model=List[ProjectResponse])
-async def get_projects(payload=Depends(JWTBearer())):
-    projects_collection = await get_projects_collection()
+@router.get("/projects/stats", response_model=List[ProjectStats])
+async def get_projects_stats(projects: ProjectRepo = Depends(get_project_repo), payload=Depends(JWTBearer())):
+    """Task statistics for every project visible to the caller"""
+    project_ids = await projects.list_ids(projects.visible_filter(payload))
+    rollups = await get_project_stats(project_ids)
     
-    # If admin, return all projects, otherwise only user's projects
-    if payload["role"] == "admin":
-        projects_cursor = projects_collection.find()
-    else:
- 
-        filter_key = "author_id" if await has_projects_with_author_id(projects_collection) else "user_id"
-        projects_cursor = projects_collection.find({filter_key: payload["user_id"]})
-    
-    projects = []
-    async for project in projects_cursor:
-        project_dict = {
-            "id": str(project["_id"]),
-            "description": project["description"],
-            "status": project.get("status", ProjectStatus.PENDING),
-            "created_at": project["created_at"],
-            "updated_at": project["updated_at"],
-            "deadline": project.get("deadline", datetime.utcnow()), 
-            "author_id": project.get("author_id", project.get("user_id")),
-            "assigned_by": project.get("assigned_by", None)
-        }
-        
-        if "name" in project:
-            project_dict["name"] = project["name"]
-            
-        projects.append(project_dict)
-    
-    return projects
-
-async def has_projects_with_author_id(collection):
-    """Check if the collection has documents with author_id instead of user_id"""
-    count = await collection.count_documents({"author_id": {"$exists": True}})
-    return count > 0
+    return [stats_response(project_id, rollups.get(project_id)) for project_id in project_ids]
 
-@router.get("/projects/{project_id}", response_model=ProjectResponse)
-async def get_project(project_id: str, payload=Depends(JWTBearer())):
-    projects_collection = await get_projects_collection()
-    
-    project = await projects_collection.find_one({"_id": ObjectId(project_id)})
+@router.get("/projects/{project_id}/stats", response_model=ProjectStats)
+async def get_project_stats_by_id(project_id: str, projects: ProjectRepo = Depends(get_project_repo), payload=Depends(JWTBearer())):
+    """Task counts by status and priority, plus overdue tasks, read from the project rollup"""
+    project = await projects.get_active(project_id, {"author_id": 1, "user_id": 1})
     
     if not project:
         raise HTTPException(
@@ -97,50 +80,66 @@ async def get_project(project_id: str, payload=Depends(JWTBearer())):
             detail="Project not found"
         )
     
-    # Check if user has permission
-    user_field = "author_id" if "author_id" in project else "user_id"
-    if payload["role"] != "admin" and payload["user_id"] != project.get(user_field):
+    if payload["role"] != "admin" and payload["user_id"] != project_owner_id(project):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Access forbidden"
         )
     
-    response = {
-        "id": str(project["_id"]),
-        "description": project["description"],
-        "status": project.get("status", ProjectStatus.PENDING),
-        "created_at": project["created_at"],
-        "updated_at": project["updated_at"],
-        "deadline": project.get("deadline", datetime.utcnow()), 
-        "author_id": project.get("author_id", project.get("user_id")) ,
-        "assigned_by": project.get("assigned_by", None)
-    }
-    
-    if "name" in project:
-        response["name"] = project["name"]
-    
-    return response
+    rollups = await get_project_stats([project_id])
+    return stats_response(project_id, rollups.get(project_id))
 
-@router.put("/projects/{project_id}", response_model=ProjectResponse)
-async def update_project(project_id: str, project: ProjectUpdate, payload=Depends(JWTBearer())):
-    projects_collection = await get_projects_collection()
-    
-    existing_project = await projects_collection.find_one({"_id": ObjectId(project_id)})
+@router.get("/projects/{project_id}", response_model=ProjectResponse)
+async def get_project(
+    project_id: str,
+    request: Request,
+    response: Response,
+    projects: ProjectRepo = Depends(get_project_repo),
+    payload=Depends(JWTBearer())
+):
+    # The key pins the current version, so it must be resolved before the read
+    cache_key = await response_cache.key("project", project_id, visibility(payload))
+    entry = await response_cache.get(cache_key)
+    if entry:
+        etag, body = entry
+        return not_modified(request, etag) or cached_response(etag, body)
+    
+    project = await projects.get_active(project_id)
     
-    if not existing_project:
+    if not project:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Project not found"
         )
     
-    # Check if user has permission 
-    user_field = "author_id" if "author_id" in existing_project else "user_id"
-    if payload["role"] != "admin" and payload["user_id"] != existing_project.get(user_field):
+    # Check if user has permission
+    if payload["role"] != "admin" and payload["user_id"] != project_owner_id(project):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Access forbidden"
         )
     
+    etag = document_etag(project)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    response.headers["ETag"] = etag
+    
+    project_response = json_response(project_to_dict(project), ProjectResponse, response)
+    await response_cache.set(cache_key, etag, project_response.body)
+    return project_response
+
+@router.put("/projects/{project_id}", response_model=ProjectResponse)
+async def update_project(
+    project_id: str,
+    project: ProjectUpdate,
+    request: Request,
+    response: Response,
+    projects: ProjectRepo = Depends(get_project_repo),
+    payload=Depends(JWTBearer())
+):
+    expected_updated_at = if_match_updated_at(request, project_id)
+    
     project_dict = project.model_dump(exclude_unset=True)
     
     if not project_dict:
@@ -150,49 +149,79 @@ async def update_project(project_id: str, project: ProjectUpdate, payload=Depend
         )
     
     # Add updated_at field
-    project_dict["updated_at"] = datetime.utcnow()
-    
-    await projects_collection.update_one(
-        {"_id": ObjectId(project_id)},
-        {"$set": project_dict}
-    )
-    
-    updated_project = await projects_collection.find_one({"_id": ObjectId(project_id)})
-    
-    response = {
-        "id": str(updated_project["_id"]),
-        "description": updated_project["description"],
-        "status": updated_project.get("status", ProjectStatus.PENDING),
-        "created_at": updated_project["created_at"],
-        "updated_at": updated_project["updated_at"],
-        "deadline": updated_project.get("deadline", datetime.utcnow()),  # Default if missing
-        "author_id": updated_project.get("author_id", updated_project.get("user_id")),
-        "assigned_by": updated_project.get("assigned_by", None)
-    }
+    project_dict["updated_at"] = utcnow()
+    
+    # The ownership check is part of the filter so the update is a single round-trip
+    filter_query = {"_id": ObjectId(project_id), **projects.visible_filter(payload)}
+    updated_project = await projects.update(filter_query, project_dict, expected_updated_at)
+    
+    if not updated_project:
+        if expected_updated_at:
+            await raise_if_modified(projects.collection, filter_query)
+        # Only failed updates pay for a second lookup to tell 404 from 403
+        if not await projects.exists_active(project_id):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Project not found"
+            )
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access forbidden"
+        )
     
-    if "name" in updated_project:
-        response["name"] = updated_project["name"]
+    await response_cache.invalidate("project", project_id)
+    response.headers["ETag"] = document_etag(updated_project)
     
-    return response
+    return json_response(project_to_dict(updated_project), ProjectResponse, response)
 
 @router.delete("/projects/{project_id}", status_code=204)
-async def delete_project(project_id: str, payload=Depends(JWTBearer())):
-    projects_collection = await get_projects_collection()
-    tasks_collection = await get_tasks_collection()
-    
-    project = await projects_collection.find_one({"_id": ObjectId(project_id)})
+async def delete_project(
+    project_id: str,
+    projects: ProjectRepo = Depends(get_project_repo),
+    tasks: TaskRepo = Depends(get_task_repo),
+    payload=Depends(JWTBearer())
+):
+    # Only the owner can delete a project. The project and its tasks are hidden
+    # immediately; the tasks are removed in the background by the project reaper.
+    now = utcnow()
+    project = await projects.soft_delete(project_id, payload["user_id"], now)
 
     if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-    
-    # Check if the user is the owner of the project
-    if project["author_id"] != payload["user_id"]:
+        if not await projects.exists_active(project_id):
+            raise HTTPException(status_code=404, detail="Project not found")
         raise HTTPException(status_code=403, detail="Not authorized")
 
-    # Delete the project
-    await projects_collection.delete_one({"_id": ObjectId(project_id)})
+    await tasks.hide_project_tasks(project_id, now)
+    await response_cache.invalidate("project", project_id)
+    if response_cache.enabled:
+        # Cached task responses would otherwise outlive the tasks until the reaper gets to them
+        await response_cache.invalidate("task", *await tasks.project_task_ids(project_id))
+    await record_tombstone("projects", project_id, [payload["user_id"]], now)
+    return {"detail": "Project deleted, related tasks are being removed"}
 
-    # Delete tasks associated with the project
-    await tasks_collection.delete_many({"project_id": project_id})
-
-    return {"detail": "Project and related tasks deleted"}
+@router.get("/projects/{project_id}/deletion", response_model=ProjectDeletionStatus)
+async def get_project_deletion(project_id: str, projects: ProjectRepo = Depends(get_project_repo), payload=Depends(JWTBearer())):
+    """Progress of the background removal of a deleted project's tasks"""
+    project = await projects.get(project_id, {"author_id": 1, "user_id": 1, "deletion": 1})
+    
+    if not project or "deletion" not in project:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No deletion found for this project"
+        )
+    
+    if payload["role"] != "admin" and payload["user_id"] != project_owner_id(project):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access forbidden"
+        )
+    
+    deletion = project["deletion"]
+    return {
+        "project_id": project_id,
+        "status": deletion["status"],
+        "requested_at": deletion["requested_at"],
+        "tasks_deleted": deletion.get("tasks_deleted", 0),
+        "tasks_total": deletion.get("tasks_total"),
+        "completed_at": deletion.get("completed_at")
+    }
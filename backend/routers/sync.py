@@ -0,0 +1,174 @@
+from fastapi import APIRouter, HTTPException, status, Depends
+from typing import Optional
+from datetime import datetime, timedelta
+from auth.auth_bearer import JWTBearer
+from auth.permissions import task_access_filter, restrict_filter
+from config import settings
+from database import get_tombstones_collection, utcnow
+from etags import EPOCH, to_millis
+from repositories import ProjectRepo, TaskRepo, UserRepo, get_project_repo, get_task_repo, get_user_repo
+from serializers import project_to_dict, task_to_dict, user_to_dict, json_response
+from bson import ObjectId
+from routers.tasks import TASK_PROJECTION
+import base64
+import json
+
+router = APIRouter(tags=["sync"])
+
+SYNCED_COLLECTIONS = ("projects", "tasks", "users")
+
+def encode_sync_token(snapshot: datetime, payload, resume=None):
+    """resume is (collection, last _id) while a reset is being paged through"""
+    data = {"t": to_millis(snapshot), "v": sync_visibility(payload)}
+    if resume:
+        data["r"] = [resume[0], str(resume[1]) if resume[1] is not None else None]
+    raw = json.dumps(data)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_sync_token(token: str):
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        data = json.loads(raw)
+        resume = None
+        if "r" in data:
+            if data["r"][0] not in SYNCED_COLLECTIONS:
+                raise ValueError("unknown collection")
+            resume = (data["r"][0], ObjectId(data["r"][1]) if data["r"][1] is not None else None)
+        return EPOCH + timedelta(milliseconds=int(data["t"])), data["v"], resume
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid sync token"
+        )
+
+def sync_visibility(payload):
+    return "admin" if payload["role"] == "admin" else payload["user_id"]
+
+async def sync_filters(payload, projects: ProjectRepo, changed_since: Optional[datetime] = None):
+    """Filter per collection of a sync; without changed_since (a reset) everything visible, and no tombstones"""
+    def changed(filter_query):
+        if changed_since is None:
+            return filter_query
+        return restrict_filter(filter_query, {"updated_at": {"$gte": changed_since}})
+
+    filters = {
+        "projects": changed(projects.visible_filter(payload)),
+        "tasks": changed(await task_access_filter(payload)),
+        "users": changed({} if payload["role"] == "admin" else {"_id": ObjectId(payload["user_id"])}),
+    }
+    if changed_since is not None:
+        filters["tombstones"] = {"deleted_at": {"$gte": changed_since}}
+        if payload["role"] != "admin":
+            filters["tombstones"]["audience"] = payload["user_id"]
+    return filters
+
+async def reset_page(repositories, filters, resume=None):
+    """Next page of a reset: up to SYNC_RESET_PAGE_SIZE documents across the synced collections.
+
+    Collections are read one after the other in _id order. Returns the
+    documents per collection and where the next page starts, or None once
+    every collection has been read.
+    """
+    content = {collection_name: [] for collection_name in SYNCED_COLLECTIONS}
+    remaining = settings.SYNC_RESET_PAGE_SIZE
+    start = SYNCED_COLLECTIONS.index(resume[0]) if resume else 0
+    after_id = resume[1] if resume else None
+
+    for collection_name in SYNCED_COLLECTIONS[start:]:
+        if remaining == 0:
+            return content, (collection_name, None)
+        repository, projection, to_dict = repositories[collection_name]
+        # One extra document tells whether the collection has more
+        documents = await repository.page(filters[collection_name], after_id, remaining + 1, projection)
+        more = len(documents) > remaining
+        documents = documents[:remaining]
+        content[collection_name] = [to_dict(document) for document in documents]
+        if more:
+            return content, (collection_name, documents[-1]["_id"])
+        remaining -= len(documents)
+        after_id = None
+
+    return content, None
+
+@router.get("/sync")
+async def sync(
+    since: Optional[str] = None,
+    projects: ProjectRepo = Depends(get_project_repo),
+    tasks: TaskRepo = Depends(get_task_repo),
+    users: UserRepo = Depends(get_user_repo),
+    payload=Depends(JWTBearer())
+):
+    """Projects, tasks and users changed since a previous sync.
+
+    Without `since`, or when `reset` is true in the response, the client
+    must replace everything it holds with the returned documents. Otherwise
+    it upserts them by id and drops the ids listed under `deleted`.
+    Documents may be sent again in a later sync; applying them is
+    idempotent. Pass the returned `token` as `since` next time.
+
+    A reset is paged: while `more` is true, call again right away with the
+    returned token to get the next SYNC_RESET_PAGE_SIZE documents, which
+    are upserted (those pages have `reset` false). The token of the last
+    page continues with deltas from when the reset started.
+    """
+    # Taken before reading, so anything written during this sync is sent again next time
+    snapshot = utcnow()
+    reset = True
+    changed_since = None
+    resume = None
+
+    if since:
+        token_time, visibility, resume = decode_sync_token(since)
+        retention = timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+        # Tombstones older than the retention are gone, and a changed role changes what is visible
+        if visibility != sync_visibility(payload) or snapshot - token_time >= retention:
+            resume = None
+        elif resume:
+            # Later pages of a reset keep its snapshot, so the first delta covers writes made while paging
+            snapshot = token_time
+            reset = False
+        else:
+            reset = False
+            # Writes stamp updated_at before they commit, so look back further than the token
+            changed_since = token_time - timedelta(seconds=settings.SYNC_OVERLAP_SECONDS)
+
+    filters = await sync_filters(payload, projects, changed_since)
+
+    if changed_since is None:
+        documents, next_page = await reset_page(
+            {
+                "projects": (projects, None, project_to_dict),
+                "tasks": (tasks, TASK_PROJECTION, task_to_dict),
+                "users": (users, None, user_to_dict),
+            },
+            filters,
+            resume
+        )
+        return json_response({
+            "token": encode_sync_token(snapshot, payload, next_page),
+            "reset": reset,
+            "more": next_page is not None,
+            **documents,
+            "deleted": {collection_name: [] for collection_name in SYNCED_COLLECTIONS}
+        })
+
+    content = {
+        "token": encode_sync_token(snapshot, payload),
+        "reset": reset,
+        "more": False,
+        "projects": [project_to_dict(project) for project in await projects.list(filters["projects"])],
+        "tasks": [task_to_dict(task) async for task in tasks.find(filters["tasks"], TASK_PROJECTION)],
+        "users": [user_to_dict(user) for user in await users.list(filters["users"])],
+        "deleted": {collection_name: [] for collection_name in SYNCED_COLLECTIONS}
+    }
+
+    tombstones_collection = get_tombstones_collection()
+    deleted = {collection_name: set() for collection_name in SYNCED_COLLECTIONS}
+    async for tombstone in tombstones_collection.find(filters["tombstones"], {"collection": 1, "document_id": 1}):
+        deleted[tombstone["collection"]].add(tombstone["document_id"])
+    # A document that is visible again (e.g. reassigned back) is sent above and must not be dropped
+    for collection_name, document_ids in deleted.items():
+        document_ids.difference_update(document["id"] for document in content[collection_name])
+        content["deleted"][collection_name] = sorted(document_ids)
+
+    return json_response(content)
@@ -1,125 +1,254 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from typing import List
-from models.task import TaskCreate, TaskResponse, TaskUpdate
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from models.task import (
+    TaskCreate, TaskResponse, TaskUpdate, TaskStatus, TaskPriority, TaskSort,
+    TaskBatchAction, TaskBatchRequest, TaskBatchResult
+)
 from auth.auth_bearer import JWTBearer
-from database import get_tasks_collection, get_projects_collection
+from database import utcnow
+from repositories import ProjectRepo, TaskRepo, get_project_repo, get_task_repo
+from config import settings
+from rollups import (
+    RollupDelta, ROLLUP_FIELDS, record_task_created, record_task_updated, record_task_deleted, rebuild_project_stats
+)
+from migrations import project_owner_id
+from serializers import task_to_dict, dumps, json_response
+from etags import (
+    document_etag, list_etag, revalidating, not_modified, if_match_updated_at, raise_if_modified, VERSION_PROJECTION
+)
+from cache import response_cache, visibility, cached_response
+from tombstones import record_tombstone, record_tombstones, task_audience, unassigned_audience
+from project_reaper import ACTIVE_TASK_FILTER
+from auth.permissions import (
+    task_access_filter, restrict_filter, check_task_access, raise_task_write_denied, get_owned_project
+)
 from bson import ObjectId
 from datetime import datetime
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, InsertOne, UpdateOne, DeleteOne
+from pymongo.errors import BulkWriteError
+import base64
+import json
 
 router = APIRouter(tags=["tasks"])
 
+MAX_PAGE_SIZE = 1000
+
+# Only the fields needed to build a TaskResponse
+TASK_PROJECTION = {
+    "title": 1,
+    "description": 1,
+    "priority": 1,
+    "status": 1,
+    "due_date": 1,
+    "project_id": 1,
+    "assigned_to": 1,
+    "created_by": 1,
+    "created_at": 1,
+    "updated_at": 1
+}
+
 @router.post("/tasks", response_model=TaskResponse)
-async def create_task(task: TaskCreate, payload=Depends(JWTBearer())):
-    tasks_collection = await get_tasks_collection()
-    projects_collection = await get_projects_collection()
-    
-    # Verify if the project exists
-    project = await projects_collection.find_one({"_id": ObjectId(task.project_id)})
-    
-    if not project:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Project not found"
-        )
-    
-    # Check if user has permission for the project
-    if payload["role"] != "admin" and payload["user_id"] != project["user_id"]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access forbidden"
-        )
+async def create_task(
+    task: TaskCreate,
+    tasks: TaskRepo = Depends(get_task_repo),
+    projects: ProjectRepo = Depends(get_project_repo),
+    payload=Depends(JWTBearer())
+):
+    # Verify that the project exists and the user has permission for it
+    project = await get_owned_project(projects, task.project_id, payload)
     
     # Add user_id, assigned_to_id, and timestamps
     task_dict = task.model_dump()
     task_dict["created_by"] = payload["user_id"]
-    task_dict["created_at"] = datetime.utcnow()
-    task_dict["updated_at"] = datetime.utcnow()
-    
-    result = await tasks_collection.insert_one(task_dict)
-    
-    created_task = await tasks_collection.find_one({"_id": result.inserted_id})
-    
-    return {
-        "id": str(created_task["_id"]),
-        "title": created_task["title"],
-        "description": created_task["description"],
-        "priority": created_task["priority"],
-        "status": created_task["status"],
-        "due_date": created_task["due_date"],
-        "project_id": created_task["project_id"],
-        "assigned_to": created_task.get("assigned_to"),
-        "created_by": created_task["created_by"],
-        "created_at": created_task["created_at"],
-        "updated_at": created_task["updated_at"]
-    }
+    task_dict["project_owner_id"] = project_owner_id(project)
+    task_dict["created_at"] = utcnow()
+    task_dict["updated_at"] = task_dict["created_at"]
+    
+    created_task = await tasks.insert(task_dict)
+    await record_task_created(created_task)
+    
+    return json_response(task_to_dict(created_task), TaskResponse)
 
 @router.get("/tasks", response_model=List[TaskResponse])
-async def get_tasks(project_id: str = None, payload=Depends(JWTBearer())):
-    tasks_collection = await get_tasks_collection()
-    projects_collection = await get_projects_collection()
+async def get_tasks(
+    request: Request,
+    response: Response,
+    project_id: str = None,
+    status_in: Optional[List[TaskStatus]] = Query(None, alias="status"),
+    priority_in: Optional[List[TaskPriority]] = Query(None, alias="priority"),
+    due_after: Optional[datetime] = None,
+    due_before: Optional[datetime] = None,
+    assigned_to: Optional[str] = None,
+    q: Optional[str] = Query(None, min_length=1, max_length=200),
+    sort: TaskSort = TaskSort.DUE_DATE,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    stream: bool = False,
+    tasks: TaskRepo = Depends(get_task_repo),
+    projects: ProjectRepo = Depends(get_project_repo),
+    payload=Depends(JWTBearer())
+):
+    """List tasks, filtered and sorted in the database.
+
+    `status` and `priority` may be repeated, `due_after`/`due_before` bound
+    the due date (inclusive/exclusive) and `q` runs a text search over title
+    and description. Results are ordered by `sort` (prefix `-` for descending)
+    with _id as tie-breaker.
+
+    With `limit`, the next page token is returned in the X-Next-Cursor header
+    and is passed back as `after`. With `stream=true`, tasks are written as
+    NDJSON straight from the cursor instead of being collected first.
+    
+    Non-streamed responses carry a weak ETag derived from the tasks on the
+    page, and a matching If-None-Match gets a 304 without loading the tasks.
+    """
+    filter_query, sort_spec = await task_list_query(
+        payload, project_id, status_in, priority_in, due_after, due_before, assigned_to, q, sort, after
+    )
     
-    # If project_id is provided, filter by project
+    if stream:
+        # The status code is sent before the first task, so validate the project up front
+        if project_id:
+            await get_owned_project(projects, project_id, payload)
+        tasks_cursor = tasks.find(filter_query, TASK_PROJECTION, sort_spec)
+        if limit:
+            tasks_cursor = tasks_cursor.limit(limit)
+        return StreamingResponse(stream_tasks(tasks_cursor), media_type="application/x-ndjson")
+    
+    # One extra document tells whether another page exists, so it is part of the ETag too
+    fetch_limit = limit + 1 if limit else 0
+    variant = (filter_query, sort.value, limit)
+    if revalidating(request):
+        versions = await tasks.find(filter_query, VERSION_PROJECTION, sort_spec).limit(fetch_limit).to_list(length=None)
+        if project_id and not versions:
+            await get_owned_project(projects, project_id, payload)
+        cached = not_modified(request, list_etag(versions, *variant))
+        if cached:
+            return cached
+    
+    page = [task async for task in tasks.find(filter_query, TASK_PROJECTION, sort_spec).limit(fetch_limit)]
+    response.headers["ETag"] = list_etag(page, *variant)
+    
+    # Any empty page, first or not, may mean a missing or foreign project; only then pay for the lookup
+    if project_id and not page:
+        await get_owned_project(projects, project_id, payload)
+    
+    if limit and len(page) > limit:
+        page = page[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(page[-1], sort)
+    
+    return json_response([task_to_dict(task) for task in page], List[TaskResponse], response)
+
+async def task_list_query(
+    payload,
+    project_id: Optional[str] = None,
+    status_in: Optional[List[TaskStatus]] = None,
+    priority_in: Optional[List[TaskPriority]] = None,
+    due_after: Optional[datetime] = None,
+    due_before: Optional[datetime] = None,
+    assigned_to: Optional[str] = None,
+    q: Optional[str] = None,
+    sort: TaskSort = TaskSort.DUE_DATE,
+    after: Optional[str] = None
+):
+    """Filter and sort of a task listing; scripts/check_query_plans.py explains the same shapes"""
     filter_query = {}
-    
     if project_id:
-        # Verify if the project exists
-        project = await projects_collection.find_one({"_id": ObjectId(project_id)})
-        
-        if not project:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Project not found"
-            )
-        
-        # Check if user has permission for the project
-        if payload["role"] != "admin" and payload["user_id"] != project["user_id"]:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Access forbidden"
-            )
-        
         filter_query["project_id"] = project_id
+    if status_in:
+        filter_query["status"] = {"$in": [value.value for value in status_in]}
+    if priority_in:
+        filter_query["priority"] = {"$in": [value.value for value in priority_in]}
+    if due_after or due_before:
+        filter_query["due_date"] = {}
+        if due_after:
+            filter_query["due_date"]["$gte"] = due_after
+        if due_before:
+            filter_query["due_date"]["$lt"] = due_before
+    if assigned_to:
+        filter_query["assigned_to"] = assigned_to
+    if q:
+        filter_query["$text"] = {"$search": q}
+    
+    # Listing a project's tasks requires owning it; otherwise show owned or assigned tasks
+    filter_query = restrict_filter(
+        filter_query,
+        await task_access_filter(payload, owner_only=bool(project_id))
+    )
     
-    # If not admin, filter by projects where user is owner or assigned
-    if payload["role"] != "admin":
-        # Get all projects where the user is owner
-        user_projects = []
-        async for project in projects_collection.find({"user_id": payload["user_id"]}):
-            user_projects.append(str(project["_id"]))
-        
-        # Filter by user's projects or tasks assigned to the user
-        if not project_id:  # Only apply this filter if no specific project_id was provided
-            filter_query["$or"] = [
-                {"project_id": {"$in": user_projects}},
-                {"assigned_to": payload["user_id"]}
-            ]
-    
-    tasks_cursor = tasks_collection.find(filter_query)
+    # Keyset pagination: resume strictly after the last (sort value, _id) seen
+    if after:
+        filter_query = {"$and": [filter_query, keyset_filter(sort, *decode_cursor(after, sort))]}
     
-    tasks = []
+    sort_field = sort.value.lstrip("-")
+    sort_direction = DESCENDING if sort.value.startswith("-") else ASCENDING
+    return filter_query, [(sort_field, sort_direction), ("_id", sort_direction)]
+
+async def stream_tasks(tasks_cursor):
     async for task in tasks_cursor:
-        tasks.append({
-            "id": str(task["_id"]),
-            "title": task["title"],
-            "description": task["description"],
-            "priority": task["priority"],
-            "status": task["status"],
-            "due_date": task["due_date"],
-            "project_id": task["project_id"],
-            "assigned_to": task.get("assigned_to"),
-            "created_by": task["created_by"],
-            "created_at": task["created_at"],
-            "updated_at": task["updated_at"]
-        })
-    
-    return tasks
+        yield dumps(task_to_dict(task)) + b"\n"
+
+def keyset_filter(sort: TaskSort, after_value, after_id):
+    """Tasks that come strictly after (after_value, after_id) in sort order.
+
+    MongoDB sorts a missing or null value before every date, and range
+    operators never match null, so tasks without a value need their own
+    branches.
+    """
+    sort_field = sort.value.lstrip("-")
+    comparison = "$lt" if sort.value.startswith("-") else "$gt"
+    tied = {sort_field: after_value, "_id": {comparison: after_id}}
+    if after_value is None:
+        if comparison == "$lt":
+            return tied
+        return {"$or": [{sort_field: {"$ne": None}}, tied]}
+    branches = [{sort_field: {comparison: after_value}}, tied]
+    if comparison == "$lt":
+        branches.append({sort_field: None})
+    return {"$or": branches}
+
+def encode_cursor(task, sort: TaskSort):
+    """Build an opaque pagination token from the last task of a page"""
+    value = task.get(sort.value.lstrip("-"))
+    raw = json.dumps({
+        "s": sort.value,
+        "v": value.isoformat() if value is not None else None,
+        "i": str(task["_id"])
+    })
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(token: str, sort: TaskSort):
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        data = json.loads(raw)
+        if data["s"] != sort.value:
+            raise ValueError("cursor was issued for another sort order")
+        value = datetime.fromisoformat(data["v"]) if data["v"] is not None else None
+        return value, ObjectId(data["i"])
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
 
 @router.get("/tasks/{task_id}", response_model=TaskResponse)
-async def get_task(task_id: str, payload=Depends(JWTBearer())):
-    tasks_collection = await get_tasks_collection()
-    projects_collection = await get_projects_collection()
-    
-    task = await tasks_collection.find_one({"_id": ObjectId(task_id)})
+async def get_task(
+    task_id: str,
+    request: Request,
+    response: Response,
+    tasks: TaskRepo = Depends(get_task_repo),
+    payload=Depends(JWTBearer())
+):
+    # The key pins the current version, so it must be resolved before the read
+    cache_key = await response_cache.key("task", task_id, visibility(payload))
+    entry = await response_cache.get(cache_key)
+    if entry:
+        etag, body = entry
+        return not_modified(request, etag) or cached_response(etag, body)
+    
+    # Tasks of a soft-deleted project are gone as far as clients are concerned
+    task = await tasks.get_active(task_id)
     
     if not task:
         raise HTTPException(
@@ -127,56 +256,29 @@ async def get_task(task_id: str, payload=Depends(JWTBearer())):
             detail="Task not found"
         )
     
-    # Get the project to check permissions
-    project = await projects_collection.find_one({"_id": ObjectId(task["project_id"])})
+    # The task carries its project's owner, so no project lookup is needed
+    await check_task_access(task, payload)
     
-    # Check if user has permission
-    if (payload["role"] != "admin" and 
-        payload["user_id"] != project["user_id"] and 
-        task.get("assigned_to") != payload["user_id"]):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access forbidden"
-        )
+    etag = document_etag(task)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    response.headers["ETag"] = etag
     
-    return {
-        "id": str(task["_id"]),
-        "title": task["title"],
-        "description": task["description"],
-        "priority": task["priority"],
-        "status": task["status"],
-        "due_date": task["due_date"],
-        "project_id": task["project_id"],
-        "assigned_to": task.get("assigned_to"),
-        "created_by": task["created_by"],
-        "created_at": task["created_at"],
-        "updated_at": task["updated_at"]
-    }
+    task_response = json_response(task_to_dict(task), TaskResponse, response)
+    await response_cache.set(cache_key, etag, task_response.body)
+    return task_response
 
 @router.put("/tasks/{task_id}", response_model=TaskResponse)
-async def update_task(task_id: str, task: TaskUpdate, payload=Depends(JWTBearer())):
-    tasks_collection = await get_tasks_collection()
-    projects_collection = await get_projects_collection()
-    
-    existing_task = await tasks_collection.find_one({"_id": ObjectId(task_id)})
-    
-    if not existing_task:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Task not found"
-        )
-    
-    # Get the project to check permissions
-    project = await projects_collection.find_one({"_id": ObjectId(existing_task["project_id"])})
-    
-    # Check if user has permission
-    if (payload["role"] != "admin" and 
-        payload["user_id"] != project["user_id"] and 
-        existing_task.get("assigned_to") != payload["user_id"]):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access forbidden"
-        )
+async def update_task(
+    task_id: str,
+    task: TaskUpdate,
+    request: Request,
+    response: Response,
+    tasks: TaskRepo = Depends(get_task_repo),
+    payload=Depends(JWTBearer())
+):
+    expected_updated_at = if_match_updated_at(request, task_id)
     
     task_dict = task.model_dump(exclude_unset=True)
     
@@ -187,50 +289,278 @@ async def update_task(task_id: str, task: TaskUpdate, payload=Depends(JWTBearer(
         )
     
     # Add updated_at field
-    task_dict["updated_at"] = datetime.utcnow()
-    
-    await tasks_collection.update_one(
-        {"_id": ObjectId(task_id)},
-        {"$set": task_dict}
+    task_dict["updated_at"] = utcnow()
+    
+    # Owner, assignee or admin: the permission check is part of the update filter.
+    # The previous version is returned so the project rollup can be adjusted.
+    filter_query = restrict_filter({"_id": ObjectId(task_id)}, await task_access_filter(payload))
+    previous_task = await tasks.update(
+        filter_query,
+        task_dict,
+        expected_updated_at,
+        return_document=ReturnDocument.BEFORE
     )
     
-    updated_task = await tasks_collection.find_one({"_id": ObjectId(task_id)})
-    
-    return {
-        "id": str(updated_task["_id"]),
-        "title": updated_task["title"],
-        "description": updated_task["description"],
-        "priority": updated_task["priority"],
-        "status": updated_task["status"],
-        "due_date": updated_task["due_date"],
-        "project_id": updated_task["project_id"],
-        "assigned_to": updated_task.get("assigned_to"),
-        "created_by": updated_task["created_by"],
-        "created_at": updated_task["created_at"],
-        "updated_at": updated_task["updated_at"]
-    }
+    if not previous_task:
+        if expected_updated_at:
+            await raise_if_modified(tasks.collection, filter_query)
+        await raise_task_write_denied(tasks, task_id)
+    
+    updated_task = {**previous_task, **task_dict}
+    await response_cache.invalidate("task", task_id)
+    # Lets the previous assignee's next sync drop the task
+    hidden_from = unassigned_audience(previous_task, updated_task)
+    if hidden_from:
+        await record_tombstone("tasks", task_id, hidden_from, task_dict["updated_at"])
+    await record_task_updated(previous_task, updated_task)
+    response.headers["ETag"] = document_etag(updated_task)
+    
+    return json_response(task_to_dict(updated_task), TaskResponse, response)
 
 @router.delete("/tasks/{task_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_task(task_id: str, payload=Depends(JWTBearer())):
-    tasks_collection = await get_tasks_collection()
-    projects_collection = await get_projects_collection()
+async def delete_task(task_id: str, tasks: TaskRepo = Depends(get_task_repo), payload=Depends(JWTBearer())):
+    # Only the project owner or an admin can delete tasks
+    deleted_task = await tasks.delete(
+        restrict_filter({"_id": ObjectId(task_id)}, await task_access_filter(payload, owner_only=True)),
+        projection={"project_owner_id": 1, "assigned_to": 1, **{field: 1 for field in ROLLUP_FIELDS}}
+    )
     
-    existing_task = await tasks_collection.find_one({"_id": ObjectId(task_id)})
+    if not deleted_task:
+        await raise_task_write_denied(tasks, task_id)
     
-    if not existing_task:
+    await response_cache.invalidate("task", task_id)
+    await record_tombstone("tasks", task_id, task_audience(deleted_task))
+    await record_task_deleted(deleted_task)
+
+@router.post("/tasks:batch", response_model=List[TaskBatchResult])
+async def batch_tasks(
+    batch: TaskBatchRequest,
+    tasks: TaskRepo = Depends(get_task_repo),
+    projects: ProjectRepo = Depends(get_project_repo),
+    payload=Depends(JWTBearer())
+):
+    """Apply many task creates/updates/deletes in one unordered bulk write.
+
+    Permissions are resolved once per distinct project, and every operation
+    gets its own result, so one rejected item does not fail the batch. A
+    task may appear in one operation only, and updates and deletes apply
+    only to the version of the task read before the write.
+    """
+    if len(batch.operations) > settings.TASK_BATCH_MAX_OPERATIONS:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Task not found"
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"A batch can contain at most {settings.TASK_BATCH_MAX_OPERATIONS} operations"
         )
     
-    # Get the project to check permissions
-    project = await projects_collection.find_one({"_id": ObjectId(existing_task["project_id"])})
-    
-    # Check if user has permission (only project owner or admin can delete tasks)
-    if payload["role"] != "admin" and payload["user_id"] != project["user_id"]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Access forbidden"
+    results = [
+        TaskBatchResult(index=index, op=operation.op, id=operation.id, status=status.HTTP_200_OK)
+        for index, operation in enumerate(batch.operations)
+    ]
+    
+    def reject(index, code, detail):
+        results[index].status = code
+        results[index].detail = detail
+    
+    # Validate the shape of every operation before touching the database
+    seen_ids = set()
+    for index, operation in enumerate(batch.operations):
+        if operation.op == TaskBatchAction.CREATE:
+            if operation.task is None:
+                reject(index, status.HTTP_400_BAD_REQUEST, "A create operation requires task")
+            elif not ObjectId.is_valid(operation.task.project_id):
+                reject(index, status.HTTP_400_BAD_REQUEST, "Invalid project_id")
+        elif not operation.id or not ObjectId.is_valid(operation.id):
+            reject(index, status.HTTP_400_BAD_REQUEST, "A valid task id is required")
+        elif operation.op == TaskBatchAction.UPDATE and (
+            operation.changes is None or not operation.changes.model_dump(exclude_unset=True)
+        ):
+            reject(index, status.HTTP_400_BAD_REQUEST, "No fields to update")
+        elif operation.id in seen_ids:
+            # Every operation is applied to the version read below, so a task can only be touched once
+            reject(index, status.HTTP_409_CONFLICT, "The task already appears earlier in the batch")
+        else:
+            seen_ids.add(operation.id)
+    
+    pending = [index for index, result in enumerate(results) if result.status == status.HTTP_200_OK]
+    
+    # One query for every task touched by an update or delete
+    task_ids = {
+        ObjectId(batch.operations[index].id)
+        for index in pending
+        if batch.operations[index].op != TaskBatchAction.CREATE
+    }
+    existing_tasks = {}
+    if task_ids:
+        existing_tasks = await tasks.get_many(
+            task_ids,
+            {
+                "project_owner_id": 1, "assigned_to": 1, "updated_at": 1, "project_deleted_at": 1,
+                **{field: 1 for field in ROLLUP_FIELDS}
+            }
         )
     
-    await tasks_collection.delete_one({"_id": ObjectId(task_id)})
\ No newline at end of file
+    # One query for every distinct project whose owner is still unknown
+    project_ids = {
+        batch.operations[index].task.project_id
+        for index in pending
+        if batch.operations[index].op == TaskBatchAction.CREATE
+    }
+    project_ids.update(
+        task["project_id"] for task in existing_tasks.values() if "project_owner_id" not in task
+    )
+    project_owners = await projects.owners(project_ids) if project_ids else {}
+    
+    is_admin = payload["role"] == "admin"
+    user_id = payload["user_id"]
+    now = utcnow()
+    requests = []
+    request_indexes = []
+    # (before, after) task versions per request, for the project rollups
+    request_changes = []
+    
+    for index in pending:
+        operation = batch.operations[index]
+        
+        if operation.op == TaskBatchAction.CREATE:
+            owner_id = project_owners.get(operation.task.project_id)
+            if owner_id is None:
+                reject(index, status.HTTP_404_NOT_FOUND, "Project not found")
+                continue
+            if not is_admin and owner_id != user_id:
+                reject(index, status.HTTP_403_FORBIDDEN, "Access forbidden")
+                continue
+            
+            task_dict = operation.task.model_dump()
+            task_dict["_id"] = ObjectId()
+            task_dict["created_by"] = user_id
+            task_dict["project_owner_id"] = owner_id
+            task_dict["created_at"] = now
+            task_dict["updated_at"] = now
+            results[index].id = str(task_dict["_id"])
+            results[index].status = status.HTTP_201_CREATED
+            requests.append(InsertOne(task_dict))
+            request_changes.append((None, task_dict))
+        else:
+            task = existing_tasks.get(operation.id)
+            if task is None or task.get("project_deleted_at") is not None:
+                reject(index, status.HTTP_404_NOT_FOUND, "Task not found")
+                continue
+            owner_id = task.get("project_owner_id", project_owners.get(task["project_id"]))
+            
+            if operation.op == TaskBatchAction.UPDATE:
+                if not is_admin and owner_id != user_id and task.get("assigned_to") != user_id:
+                    reject(index, status.HTTP_403_FORBIDDEN, "Access forbidden")
+                    continue
+                task_dict = operation.changes.model_dump(exclude_unset=True)
+                task_dict["updated_at"] = now
+                requests.append(UpdateOne(version_filter(task), {"$set": task_dict}))
+                request_changes.append((task, {**task, **task_dict}))
+            else:
+                # Only project owners or admins can delete tasks
+                if not is_admin and owner_id != user_id:
+                    reject(index, status.HTTP_403_FORBIDDEN, "Access forbidden")
+                    continue
+                results[index].status = status.HTTP_204_NO_CONTENT
+                requests.append(DeleteOne(version_filter(task)))
+                request_changes.append((task, None))
+        
+        request_indexes.append(index)
+    
+    if requests:
+        failed = set()
+        try:
+            counts = (await tasks.bulk_write(requests)).bulk_api_result
+        except BulkWriteError as e:
+            counts = e.details
+            for error in e.details.get("writeErrors", []):
+                failed.add(error["index"])
+                reject(request_indexes[error["index"]], status.HTTP_409_CONFLICT, error.get("errmsg"))
+        
+        # Updates and deletes only apply to the version read above. The bulk result only has
+        # totals, so when some of them matched nothing, find out which ones with one more query.
+        updates = [
+            position for position, (before, after) in enumerate(request_changes)
+            if before is not None and after is not None and position not in failed
+        ]
+        deletes = [
+            position for position, (before, after) in enumerate(request_changes)
+            if after is None and position not in failed
+        ]
+        unmatched = set()
+        if counts.get("nMatched", 0) < len(updates) or counts.get("nRemoved", 0) < len(deletes):
+            unmatched = await find_unmatched(tasks, request_changes, updates, deletes, counts.get("nRemoved", 0), now)
+            for position, code, detail in unmatched:
+                reject(request_indexes[position], code, detail)
+            unmatched = {position for position, _, _ in unmatched}
+        
+        changed_ids = []
+        deletions = []
+        for position, (before, after) in enumerate(request_changes):
+            if before is None or position in failed or position in unmatched:
+                continue
+            changed_ids.append(str(before["_id"]))
+            # Deleted tasks, and reassigned ones for their previous assignee, go to the sync tombstones
+            audience = task_audience(before) if after is None else unassigned_audience(before, after)
+            if audience:
+                deletions.append((before["_id"], audience))
+        await response_cache.invalidate("task", *changed_ids)
+        await record_tombstones("tasks", deletions, now)
+        
+        delta = RollupDelta()
+        for position, (before, after) in enumerate(request_changes):
+            if position in failed or position in unmatched:
+                continue
+            if before is None:
+                delta.add(after)
+            elif after is None:
+                delta.remove(before)
+            else:
+                delta.change(before, after)
+        await delta.apply()
+        
+        if unmatched:
+            # A concurrent request got between the read and the write; recount those projects from their tasks
+            await rebuild_project_stats({request_changes[position][0]["project_id"] for position in unmatched})
+    
+    return results
+
+def version_filter(task):
+    """Matches a task only while it is still the version that was read, and its project is not deleted"""
+    return {"_id": task["_id"], "updated_at": task.get("updated_at"), **ACTIVE_TASK_FILTER}
+
+async def find_unmatched(tasks, request_changes, updates, deletes, removed: int, now):
+    """(position, status, detail) of the batch updates and deletes that matched nothing.
+
+    An update applied when its task now carries the batch's updated_at, and
+    a delete did not apply when its task is still there. Tasks whose project
+    was deleted in the meantime count as not found. Missing tasks are
+    only known to be ours when their number equals the removed count;
+    otherwise another request deleted some of them first, and they are all
+    reported as not found.
+    """
+    current = await tasks.get_many(
+        {request_changes[position][0]["_id"] for position in updates + deletes},
+        {"updated_at": 1, "project_deleted_at": 1}
+    )
+    unmatched = []
+    for position in updates:
+        task = current.get(str(request_changes[position][0]["_id"]))
+        if task is not None and task.get("updated_at") == now:
+            continue
+        if task is None or task.get("project_deleted_at") is not None:
+            unmatched.append((position, status.HTTP_404_NOT_FOUND, "Task not found"))
+        else:
+            unmatched.append((position, status.HTTP_409_CONFLICT, "The task was modified by another request"))
+    
+    missing = []
+    for position in deletes:
+        task = current.get(str(request_changes[position][0]["_id"]))
+        if task is not None and task.get("project_deleted_at") is not None:
+            unmatched.append((position, status.HTTP_404_NOT_FOUND, "Task not found"))
+        elif task is not None:
+            unmatched.append((position, status.HTTP_409_CONFLICT, "The task was modified by another request"))
+        else:
+            missing.append(position)
+    if len(missing) != removed:
+        unmatched.extend((position, status.HTTP_404_NOT_FOUND, "Task not found") for position in missing)
+    return unmatched
@@ -1,15 +1,34 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Request, Response
 from models.user import UserResponse, UserUpdate
 from auth.auth_bearer import JWTBearer
-from database import get_users_collection
+from auth.principal_cache import principal_cache
+from auth.revocations import publish_revocation
+from tombstones import record_tombstone
+from database import utcnow
+from repositories import UserRepo, get_user_repo
+from serializers import user_to_dict, json_response
+from etags import document_etag, not_modified, if_match_updated_at, raise_if_modified
+from cache import response_cache, cached_response
 from bson import ObjectId
 
 router = APIRouter(tags=["users"])
 
 @router.get("/users/me", response_model=UserResponse)
-async def get_current_user(payload=Depends(JWTBearer())):
-    users_collection = await get_users_collection()
-    user = await users_collection.find_one({"_id": ObjectId(payload["user_id"])})
+async def get_current_user(
+    request: Request,
+    response: Response,
+    users: UserRepo = Depends(get_user_repo),
+    payload=Depends(JWTBearer())
+):
+    user_id = payload["user_id"]
+    cache_key = await response_cache.key("user", user_id, user_id)
+    entry = await response_cache.get(cache_key)
+    if entry:
+        etag, body = entry
+        return not_modified(request, etag) or cached_response(etag, body)
+    
+    # Read from MongoDB: the principal cache is per worker and would serve a stale user
+    user = await users.get(user_id)
     
     if not user:
         raise HTTPException(
@@ -17,25 +36,25 @@ async def get_current_user(payload=Depends(JWTBearer())):
             detail="User not found"
         )
     
-    return {
-        "id": str(user["_id"]),
-        "name": user["name"],
-        "email": user["email"],
-        "role": user["role"],
-        "created_at": user["created_at"],
-        "updated_at": user["updated_at"]
-    }
+    etag = document_etag(user)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    response.headers["ETag"] = etag
+    
+    user_response = json_response(user_to_dict(user), UserResponse, response)
+    await response_cache.set(cache_key, etag, user_response.body)
+    return user_response
 
 @router.get("/users/{user_id}", response_model=UserResponse)
-async def get_user(user_id: str, payload=Depends(JWTBearer())):
+async def get_user(user_id: str, users: UserRepo = Depends(get_user_repo), payload=Depends(JWTBearer())):
     if payload["role"] != "admin" and payload["user_id"] != user_id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Access forbidden"
         )
     
-    users_collection = await get_users_collection()
-    user = await users_collection.find_one({"_id": ObjectId(user_id)})
+    user = await users.get(user_id)
     
     if not user:
         raise HTTPException(
@@ -43,49 +62,35 @@ async def get_user(user_id: str, payload=Depends(JWTBearer())):
             detail="User not found"
         )
     
-    return {
-        "id": str(user["_id"]),
-        "name": user["name"],
-        "email": user["email"],
-        "role": user["role"],
-        "created_at": user["created_at"],
-        "updated_at": user["updated_at"]
-    }
+    return json_response(user_to_dict(user), UserResponse)
 
 
 @router.get("/users", response_model=list[UserResponse])
-async def get_all_users(payload=Depends(JWTBearer())):
+async def get_all_users(users: UserRepo = Depends(get_user_repo), payload=Depends(JWTBearer())):
     if payload["role"] != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Access forbidden"
         )
         
-    users_collection = await get_users_collection()
-    users_cursor = users_collection.find()
-    users = await users_cursor.to_list(length=None)
-        
-    return [
-        {
-            "id": str(user["_id"]),
-            "name": user["name"],
-            "email": user["email"],
-            "role": user["role"],
-            "created_at": user["created_at"],
-            "updated_at": user["updated_at"]
-        }
-        for user in users
-    ]
+    return json_response([user_to_dict(user) for user in await users.list()], list[UserResponse])
 
 @router.put("/users/{user_id}", response_model=UserResponse)
-async def update_user(user_id: str, user: UserUpdate, payload=Depends(JWTBearer())):
+async def update_user(
+    user_id: str,
+    user: UserUpdate,
+    request: Request,
+    response: Response,
+    users: UserRepo = Depends(get_user_repo),
+    payload=Depends(JWTBearer())
+):
     if payload["role"] != "admin" and payload["user_id"] != user_id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Access forbidden"
         )
     
-    users_collection = await get_users_collection()
+    expected_updated_at = if_match_updated_at(request, user_id)
     user_dict = user.model_dump(exclude_unset=True)
     
     if not user_dict:
@@ -95,44 +100,64 @@ async def update_user(user_id: str, user: UserUpdate, payload=Depends(JWTBearer(
         )
     
     # Add updated_at field
-    from datetime import datetime
-    user_dict["updated_at"] = datetime.utcnow()
+    user_dict["updated_at"] = utcnow()
     
-    result = await users_collection.update_one(
-        {"_id": ObjectId(user_id)},
-        {"$set": user_dict}
-    )
+    filter_query = {"_id": ObjectId(user_id)}
+    updated_user = await users.update(filter_query, user_dict, expected_updated_at)
     
-    if result.matched_count == 0:
+    if not updated_user:
+        if expected_updated_at:
+            await raise_if_modified(users.collection, filter_query)
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
-    updated_user = await users_collection.find_one({"_id": ObjectId(user_id)})
+    await response_cache.invalidate("user", user_id)
+    if user_dict.get("role"):
+        # Tokens carry the role, so every worker must learn about the change
+        await publish_revocation(user_id, role=user_dict["role"].value)
+    response.headers["ETag"] = document_etag(updated_user)
     
-    return {
-        "id": str(updated_user["_id"]),
-        "name": updated_user["name"],
-        "email": updated_user["email"],
-        "role": updated_user["role"],
-        "created_at": updated_user["created_at"],
-        "updated_at": updated_user["updated_at"]
-    }
+    return json_response(user_to_dict(updated_user), UserResponse, response=response)
 
 @router.delete("/users/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_user(user_id: str, payload=Depends(JWTBearer())):
+async def delete_user(user_id: str, users: UserRepo = Depends(get_user_repo), payload=Depends(JWTBearer())):
+    if payload["role"] != "admin" and payload["user_id"] != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access forbidden"
+        )
+    
+    deleted = await users.delete(user_id)
+    principal_cache.invalidate(user_id)
+    await response_cache.invalidate("user", user_id)
+    
+    if not deleted:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    
+    await publish_revocation(user_id, deleted=True)
+    await record_tombstone("users", user_id, [user_id])
+
+@router.post("/users/{user_id}/revoke-tokens", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_user_tokens(user_id: str, users: UserRepo = Depends(get_user_repo), payload=Depends(JWTBearer())):
+    """Sign the user out everywhere: every token issued before this call stops working"""
     if payload["role"] != "admin" and payload["user_id"] != user_id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Access forbidden"
         )
     
-    users_collection = await get_users_collection()
-    result = await users_collection.delete_one({"_id": ObjectId(user_id)})
+    updated_user = await users.increment_token_version(user_id, utcnow())
     
-    if result.deleted_count == 0:
+    if not updated_user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
-        )
\ No newline at end of file
+        )
+    
+    await response_cache.invalidate("user", user_id)
+    await publish_revocation(user_id, token_version=updated_user["token_version"])
\ No newline at end of file
@@ -0,0 +1,120 @@
+"""Fail when a router query is executed as a collection scan.
+
+Runs explain() for the query shapes issued by the routers, built with
+the same helpers they use, against the configured database (after
+ensuring the indexes in database.INDEXES) and exits with status 1 if any
+winning plan contains a COLLSCAN stage.
+
+Usage (from backend/):
+    python -m scripts.check_query_plans
+"""
+import asyncio
+import sys
+from datetime import datetime
+from bson import ObjectId
+import database
+import migrations
+from auth.revocations import RevocationTable
+from models.task import TaskPriority, TaskSort, TaskStatus
+from project_reaper import CLAIM_SORT, claimable_filter
+from repositories import ProjectRepo
+from routers.sync import sync_filters
+from routers.tasks import encode_cursor, task_list_query
+
+USER_ID = str(ObjectId())
+PROJECT_ID = str(ObjectId())
+ADMIN = {"user_id": str(ObjectId()), "role": "admin"}
+USER = {"user_id": USER_ID, "role": "user"}
+
+async def build_queries():
+    """(description, collection, filter, sort) for each shape, built by the code that issues it"""
+    migrations._schema_version = migrations.SCHEMA_VERSION
+    now = datetime.utcnow()
+    projects = ProjectRepo(database.get_database())
+    cursor = encode_cursor({"_id": ObjectId(), "due_date": now}, TaskSort.DUE_DATE)
+    revocations = RevocationTable()
+    revocations.last_seen = now
+
+    queries = [
+        # UserRepo.get_by_email
+        ("register/login by email", "users", {"email": "someone@example.com"}, None),
+        ("get_projects for an owner", "projects", projects.visible_filter(USER), None),
+        ("get_projects for an admin", "projects", projects.visible_filter(ADMIN), None),
+        ("project reaper claim", "projects", claimable_filter(now), CLAIM_SORT),
+        ("token revocation refresh", "token_revocations", revocations.refresh_filter(), None),
+    ]
+
+    task_lists = [
+        ("get_tasks for a project", dict(project_id=PROJECT_ID)),
+        (
+            "get_tasks for a project and status",
+            dict(project_id=PROJECT_ID, status_in=[TaskStatus.PENDING], due_before=now)
+        ),
+        ("get_tasks for a non-admin user", dict()),
+        ("get_tasks next page for a non-admin user", dict(after=cursor)),
+        (
+            "get_tasks filtered by status and priority",
+            dict(status_in=[TaskStatus.PENDING, TaskStatus.IN_PROGRESS], priority_in=[TaskPriority.HIGH])
+        ),
+        ("get_tasks assigned to a user", dict(assigned_to=USER_ID)),
+        ("get_tasks text search", dict(q="report")),
+    ]
+    for description, arguments in task_lists:
+        filter_query, sort = await task_list_query(USER, **arguments)
+        queries.append((description, "tasks", filter_query, sort))
+
+    for role, payload in (("an admin", ADMIN), ("a non-admin user", USER)):
+        filters = await sync_filters(payload, projects, now)
+        for collection_name, filter_query in filters.items():
+            queries.append((f"sync {collection_name} for {role}", collection_name, filter_query, None))
+        # Reset pages read the same filters without the time bound, in _id order
+        for collection_name, filter_query in (await sync_filters(payload, projects)).items():
+            queries.append((f"sync reset page of {collection_name} for {role}", collection_name, filter_query, [("_id", 1)]))
+
+    # Shapes still issued until the migrations have run
+    migrations._schema_version = 1
+    queries.append((
+        "get_projects for an owner before the author_id migration",
+        "projects",
+        projects.visible_filter(USER),
+        None
+    ))
+    migrations._schema_version = 2
+    filter_query, sort = await task_list_query(USER)
+    queries.append(("get_tasks for a non-admin user before the project_owner_id migration", "tasks", filter_query, sort))
+
+    return queries
+
+def find_stages(plan, stage):
+    """Yield every node of an explain plan tree whose stage matches"""
+    if isinstance(plan, dict):
+        if plan.get("stage") == stage:
+            yield plan
+        for value in plan.values():
+            yield from find_stages(value, stage)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from find_stages(item, stage)
+
+async def check_query_plans():
+    await database.connect_to_mongo()
+    await database.ensure_indexes()
+
+    failures = []
+    for description, collection_name, filter_query, sort in await build_queries():
+        cursor = database.database[collection_name].find(filter_query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explanation = await cursor.explain()
+        winning_plan = explanation["queryPlanner"]["winningPlan"]
+        if any(find_stages(winning_plan, "COLLSCAN")):
+            failures.append(description)
+            print(f"COLLSCAN  {description}: {collection_name} {filter_query}")
+        else:
+            print(f"ok        {description}")
+
+    await database.close_mongo_connection()
+    return failures
+
+if __name__ == "__main__":
+    sys.exit(1 if asyncio.run(check_query_plans()) else 0)
@@ -0,0 +1,71 @@
+"""Report where the API's import time goes, and fail above a budget.
+
+Imports a module (main by default) in fresh interpreters with
+`python -X importtime`, keeps the fastest run, and prints the total, the
+cost of each top-level package and the slowest modules. Byte-code is
+compiled by a first, unmeasured run, as it is in a deployed image.
+
+Exits with status 1 when the import takes longer than --budget-ms, so
+it can guard cold starts in CI.
+
+Usage (from backend/):
+    python -m scripts.import_report --budget-ms 800
+    python -m scripts.import_report --module routers.auth --top 30
+"""
+import argparse
+import subprocess
+import sys
+
+def measure(module: str):
+    """(module, self µs, cumulative µs) for every import, in the order they finished"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        imports.append((name.rstrip(), int(self_us), int(cumulative_us)))
+    return imports
+
+def report(imports, module: str, top: int):
+    # The requested module finishes last and its cumulative time covers everything
+    total_us = next(cumulative for name, _, cumulative in reversed(imports) if name.strip() == module)
+
+    packages = {}
+    for name, self_us, _ in imports:
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0) + self_us
+
+    print(f"import {module}: {total_us / 1000:.1f} ms")
+    print(f"\n{'package':<40}{'ms':>10}")
+    for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        print(f"{package:<40}{self_us / 1000:>10.1f}")
+
+    print(f"\n{'module (self time)':<60}{'ms':>10}")
+    for name, self_us, _ in sorted(imports, key=lambda item: -item[1])[:top]:
+        print(f"{name.strip():<60}{self_us / 1000:>10.1f}")
+    return total_us / 1000
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=5, help="measured runs; the fastest is reported")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, help="fail when the import takes longer")
+    args = parser.parse_args(argv)
+
+    measure(args.module)
+    runs = [measure(args.module) for _ in range(args.runs)]
+    fastest = min(runs, key=lambda imports: imports[-1][2])
+    total_ms = report(fastest, args.module, args.top)
+
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        print(f"\nOVER BUDGET  import {args.module} took {total_ms:.1f} ms, budget {args.budget_ms:.0f} ms")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
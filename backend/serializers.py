@@ -0,0 +1,99 @@
+"""Document to response mapping and fast JSON encoding.
+
+Handlers map MongoDB documents with the functions below and return
+json_response(), which encodes straight to bytes (with orjson when it is
+installed) instead of letting FastAPI validate and re-serialise every item
+through the response_model. The response_model stays on the routes for the
+OpenAPI schema, and with DEBUG enabled the content is still validated
+against it so a drifting mapper fails loudly in development and tests.
+"""
+import json
+from datetime import datetime
+from enum import Enum
+from functools import lru_cache
+from fastapi import Response
+from pydantic import TypeAdapter
+from config import settings
+from migrations import project_owner_id
+from models.project import ProjectStatus
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def task_to_dict(task):
+    return {
+        "id": str(task["_id"]),
+        "title": task["title"],
+        "description": task["description"],
+        "priority": task["priority"],
+        "status": task["status"],
+        # Tasks written directly to the database may have no due date
+        "due_date": task.get("due_date"),
+        "project_id": task["project_id"],
+        "assigned_to": task.get("assigned_to"),
+        "created_by": task["created_by"],
+        "created_at": task["created_at"],
+        "updated_at": task["updated_at"]
+    }
+
+def project_to_dict(project):
+    return {
+        "id": str(project["_id"]),
+        "name": project.get("name"),
+        "description": project["description"],
+        "status": project.get("status", ProjectStatus.PENDING),
+        "deadline": project.get("deadline", datetime.utcnow()),
+        "author_id": project_owner_id(project),
+        "assigned_by": project.get("assigned_by", None),
+        "created_at": project["created_at"],
+        "updated_at": project["updated_at"]
+    }
+
+def user_to_dict(user):
+    return {
+        "id": str(user["_id"]),
+        "name": user["name"],
+        "email": user["email"],
+        "role": user["role"],
+        "created_at": user["created_at"],
+        "updated_at": user["updated_at"]
+    }
+
+def json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    # ObjectId and anything else that only has a string form
+    return str(value)
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=json_default)
+    return json.dumps(content, default=json_default, separators=(",", ":")).encode()
+
+@lru_cache(maxsize=None)
+def response_adapter(model):
+    return TypeAdapter(model)
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+def json_response(content, model=None, response: Response = None, status_code: int = 200):
+    """Encode already-mapped content, skipping FastAPI's response_model round-trip.
+
+    Headers set on an injected `response` (ETag, X-Next-Cursor) are carried
+    over, since FastAPI ignores that object once a Response is returned.
+    """
+    if settings.DEBUG and model is not None:
+        response_adapter(model).validate_python(content)
+
+    fast_response = FastJSONResponse(content, status_code=status_code)
+    if response is not None:
+        fast_response.headers.raw.extend(response.headers.raw)
+    return fast_response
@@ -0,0 +1,82 @@
+"""Production entrypoint: several uvicorn workers sharing one listening socket.
+
+Each worker is a separate process with its own event loop, MongoDB client
+and in-process caches, so the API can use every core. uvloop and
+httptools are used when they are installed (they are in requirements.txt,
+except uvloop on Windows).
+
+On SIGTERM or SIGINT uvicorn stops accepting connections and lets the
+requests in flight finish for up to SERVER_GRACEFUL_SHUTDOWN_SECONDS
+before each worker runs the lifespan shutdown (closing the MongoDB
+client, stopping the project reaper and the change feed).
+
+Unless MONGO_MAX_POOL_SIZE is set, MONGO_POOL_BUDGET (the connections
+this host may open to MongoDB in total) is divided between the workers.
+
+Usage (from backend/):
+    python serve.py                   # WEB_CONCURRENCY workers, default one per core
+    python serve.py --workers 4 --port 8000
+    python serve.py --reload          # development: one process, restarts on changes
+"""
+import argparse
+import importlib.util
+import logging
+import os
+import uvicorn
+from config import settings
+
+def installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+def per_worker_pool_size(workers: int) -> int:
+    return max(settings.MONGO_MIN_WORKER_POOL_SIZE, settings.MONGO_POOL_BUDGET // workers)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default=settings.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=settings.SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=settings.SERVER_WORKERS)
+    parser.add_argument("--reload", action="store_true", default=settings.SERVER_RELOAD)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    # The reloader watches files from a single process
+    workers = 1 if args.reload else max(1, args.workers)
+
+    # Workers are fresh processes that read their settings from the environment;
+    # the worker count also tells them whether in-process caches are safe. A single
+    # worker runs in this process, whose settings were built on import, so they are
+    # updated as well.
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    settings.WORKER_PROCESSES = workers
+    if "MONGO_MAX_POOL_SIZE" not in os.environ:
+        settings.MONGO_MAX_POOL_SIZE = per_worker_pool_size(workers)
+        os.environ["MONGO_MAX_POOL_SIZE"] = str(settings.MONGO_MAX_POOL_SIZE)
+
+    loop = "uvloop" if installed("uvloop") else "asyncio"
+    http = "httptools" if installed("httptools") else "h11"
+    logging.basicConfig(level=logging.INFO)
+    logging.info(
+        f"Starting {workers} worker(s) on {args.host}:{args.port} with {loop}/{http}, "
+        f"MongoDB pool of {settings.MONGO_MAX_POOL_SIZE} per worker"
+    )
+
+    uvicorn.run(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        reload=args.reload,
+        loop=loop,
+        http=http,
+        backlog=settings.SERVER_BACKLOG,
+        timeout_keep_alive=settings.SERVER_KEEP_ALIVE_SECONDS,
+        timeout_graceful_shutdown=settings.SERVER_GRACEFUL_SHUTDOWN_SECONDS,
+        access_log=settings.SERVER_ACCESS_LOG,
+        proxy_headers=True,
+        forwarded_allow_ips=settings.SERVER_FORWARDED_ALLOW_IPS
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Deletion records for GET /api/sync.
+
+A deleted document cannot be found by its updated_at any more, so every
+delete (and every change that hides a document from someone, such as a
+task being reassigned) leaves a tombstone naming the collection, the
+document id and the users who could see it:
+
+    {"collection": "tasks", "document_id": "...", "audience": [user ids], "deleted_at": ...}
+
+Admins see every tombstone. A TTL index removes tombstones after
+SYNC_TOMBSTONE_RETENTION_DAYS; clients whose sync token is older than that
+get a full reset instead of a delta.
+"""
+from bson import ObjectId
+from database import get_tombstones_collection, utcnow
+
+def task_audience(task):
+    """Users other than admins who could see a task: its project owner and assignee"""
+    return [user_id for user_id in {task.get("project_owner_id"), task.get("assigned_to")} if user_id]
+
+def unassigned_audience(before, after):
+    """Users a task update hides the task from: its previous assignee, unless they own the project"""
+    previous_assignee = before.get("assigned_to")
+    if previous_assignee and previous_assignee != after.get("assigned_to") \
+            and previous_assignee != before.get("project_owner_id"):
+        return [previous_assignee]
+    return []
+
+async def record_tombstones(collection_name: str, deletions, now=None):
+    """Insert one tombstone per (document id, audience) pair in deletions"""
+    documents = [
+        {
+            "_id": ObjectId(),
+            "collection": collection_name,
+            "document_id": str(document_id),
+            "audience": list(audience),
+            "deleted_at": now or utcnow()
+        }
+        for document_id, audience in deletions
+    ]
+    if documents:
+        tombstones_collection = get_tombstones_collection()
+        await tombstones_collection.insert_many(documents, ordered=False)
+
+async def record_tombstone(collection_name: str, document_id, audience, now=None):
+    await record_tombstones(collection_name, [(document_id, audience)], now)